@@ -17,44 +17,503 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
+import functools
+import itertools
+import math
 from typing import Any, Union
 
 from flax import nnx
 import flax.linen as nn
+import jax
 import jax.numpy as jnp
 from jaxtyping import Array, ArrayLike  # pylint: disable=g-importing-member,g-multiple-import
+import opt_einsum
 
 
 Shape = Sequence[Union[int, Any]]
 
 
+@functools.lru_cache(maxsize=None)
+def _contraction_path(
+    einsum_str: str, *shapes: tuple[int, ...]
+) -> tuple[tuple[int, ...], ...]:
+  """Returns the optimal contraction path for `einsum_str` and `shapes`."""
+  path, _ = opt_einsum.contract_path(
+      einsum_str, *shapes, shapes=True, optimize='optimal'
+  )
+  return tuple(path)
+
+
+DotGeneralSpec = tuple[jax.lax.DotDimensionNumbers, tuple[int, ...] | None]
+
+
+def _dot_general_spec(einsum_str: str) -> DotGeneralSpec | None:
+  """Expresses a two-operand `einsum_str` as a `jax.lax.dot_general` call.
+
+  Returns the dimension numbers and the permutation to apply to the
+  `dot_general` output (None if it already is in the requested order), or None
+  if the equation involves traces, diagonals, ellipses or summed free axes
+  which `dot_general` cannot express.
+  """
+  if '->' not in einsum_str or '.' in einsum_str:
+    return None
+  inputs, out = einsum_str.replace(' ', '').split('->')
+  operands = inputs.split(',')
+  if len(operands) != 2:
+    return None
+  lhs, rhs = operands
+  if any(len(set(labels)) != len(labels) for labels in (lhs, rhs, out)):
+    return None
+  if any(c not in lhs and c not in rhs for c in out):
+    return None
+  # Axes only present on one operand and absent from the output are summed
+  # before the contraction in `jnp.einsum`.
+  if any(c not in out and c not in rhs for c in lhs) or any(
+      c not in out and c not in lhs for c in rhs
+  ):
+    return None
+
+  batch = [c for c in lhs if c in rhs and c in out]
+  contract = [c for c in lhs if c in rhs and c not in out]
+  lhs_free = [c for c in lhs if c not in rhs]
+  rhs_free = [c for c in rhs if c not in lhs]
+  dims = (
+      (
+          tuple(lhs.index(c) for c in contract),
+          tuple(rhs.index(c) for c in contract),
+      ),
+      (tuple(lhs.index(c) for c in batch), tuple(rhs.index(c) for c in batch)),
+  )
+  dot_out = batch + lhs_free + rhs_free
+  perm = tuple(dot_out.index(c) for c in out)
+  return dims, (None if perm == tuple(range(len(out))) else perm)
+
+
+def _dot_general_as_matmul(
+    lhs: Array,
+    rhs: Array,
+    dimension_numbers: jax.lax.DotDimensionNumbers,
+    precision: jax.lax.Precision | None = None,
+    preferred_element_type: jnp.dtype | None = None,
+) -> Array:
+  """`jax.lax.dot_general` expressed as a batched (B, M, K) x (B, K, N) matmul.
+
+  The result has the same layout as `dot_general`: batch axes, then the free
+  axes of `lhs`, then the free axes of `rhs`.
+  """
+  (lhs_contract, rhs_contract), (lhs_batch, rhs_batch) = dimension_numbers
+  lhs_free = [i for i in range(lhs.ndim) if i not in lhs_contract + lhs_batch]
+  rhs_free = [i for i in range(rhs.ndim) if i not in rhs_contract + rhs_batch]
+  batch_shape = [lhs.shape[i] for i in lhs_batch]
+  lhs_free_shape = [lhs.shape[i] for i in lhs_free]
+  rhs_free_shape = [rhs.shape[i] for i in rhs_free]
+  lhs = jnp.transpose(lhs, (*lhs_batch, *lhs_free, *lhs_contract)).reshape(
+      math.prod(batch_shape), math.prod(lhs_free_shape), -1
+  )
+  rhs = jnp.transpose(rhs, (*rhs_batch, *rhs_contract, *rhs_free)).reshape(
+      math.prod(batch_shape), -1, math.prod(rhs_free_shape)
+  )
+  y = jnp.matmul(
+      lhs,
+      rhs,
+      precision=precision,
+      preferred_element_type=preferred_element_type,
+  )
+  return y.reshape(*batch_shape, *lhs_free_shape, *rhs_free_shape)
+
+
+@functools.partial(
+    jax.jit,
+    static_argnames=(
+        'einsum_str',
+        'dot_general_spec',
+        'precision',
+        'preferred_element_type',
+    ),
+)
+def _einsum(
+    x: ArrayLike,
+    w: Array,
+    w_scale: Array | None,
+    *,
+    einsum_str: str,
+    dot_general_spec: DotGeneralSpec | None,
+    precision: jax.lax.Precision | None = None,
+    preferred_element_type: jnp.dtype | None = None,
+) -> Array:
+  """Compiled `Einsum` forward, specialized on the equation and shapes."""
+  x = jnp.asarray(x)
+  if w_scale is not None:
+    # Dequantize inside the computation so XLA fuses it into the contraction
+    # and only the quantized weight is read from memory. The weight is
+    # dequantized in the activation dtype, so e.g. bfloat16 activations are
+    # not upcast to the float32 dtype of the scales.
+    dtype = (
+        x.dtype if jnp.issubdtype(x.dtype, jnp.floating) else w_scale.dtype
+    )
+    w = w.astype(dtype) * w_scale.astype(dtype)
+  if dot_general_spec is not None:
+    dims, perm = dot_general_spec
+    dtype = jnp.result_type(x, w)
+    # XLA:CPU maps rank-3 matmuls onto its GEMM kernels more reliably than
+    # general dot_generals, so those are canonicalized on CPU.
+    dot_general = (
+        _dot_general_as_matmul
+        if jax.default_backend() == 'cpu'
+        else jax.lax.dot_general
+    )
+    y = dot_general(
+        x.astype(dtype),
+        w.astype(dtype),
+        dims,
+        precision=precision,
+        preferred_element_type=preferred_element_type,
+    )
+    return y if perm is None else jnp.transpose(y, perm)
+  # Planning the contraction is done once per equation and shapes instead of
+  # on every trace.
+  path = _contraction_path(einsum_str, x.shape, w.shape)
+  return jnp.einsum(
+      einsum_str,
+      x,
+      w,
+      optimize=list(path),
+      precision=precision,
+      preferred_element_type=preferred_element_type,
+  )
+
+
+class QuantizedParam(nnx.Variable):
+  """A quantized weight or its scales.
+
+  Not an `nnx.Param`, so `nnx.grad` and optimizers, which default to `Param`s,
+  leave quantized weights frozen: they are for inference only.
+  """
+
+
 class Einsum(nnx.Module):
-  """Einsum is a convenience module for parameterized tensor multiplication."""
+  """Einsum is a convenience module for parameterized tensor multiplication.
+
+  If `quant_dtype` is set (e.g. `jnp.int8` or `jnp.float8_e4m3fn`), the weight
+  is stored quantized in `w_q` with float32 scales in `w_scale`, one per slice
+  of the weight along its non-contracted axes, and is dequantized on the fly.
+  Both are `QuantizedParam`s rather than trainable `nnx.Param`s.
 
-  def __init__(self, einsum_str: str, shape: Shape, *, rngs: nnx.Rngs):
+  `precision` and `preferred_element_type` are forwarded to the contraction,
+  e.g. `jax.lax.Precision.HIGHEST` to disable reduced-precision tensor core
+  paths when debugging numerics.
+  """
+
+  def __init__(
+      self,
+      einsum_str: str,
+      shape: Shape,
+      *,
+      quant_dtype: jnp.dtype | None = None,
+      precision: jax.lax.Precision = jax.lax.Precision.DEFAULT,
+      preferred_element_type: jnp.dtype | None = None,
+      rngs: nnx.Rngs,
+  ):
+    operands = einsum_str.replace(' ', '').split('->')[0].split(',')
+    if len(operands) == 2 and '.' not in operands[1]:
+      if len(operands[1]) != len(shape):
+        raise ValueError(
+            f'Weight labels {operands[1]!r} of {einsum_str!r} do not match'
+            f' the rank of shape {tuple(shape)}.'
+        )
     self.einsum_str = einsum_str
-    self.w = nnx.Param(nn.initializers.normal()(rngs.params(), shape))
+    self.quant_dtype = quant_dtype
+    self.precision = precision
+    self.preferred_element_type = preferred_element_type
+    self._dot_general_spec = _dot_general_spec(einsum_str)
+    w = nn.initializers.normal()(rngs.params(), shape)
+    if quant_dtype is None:
+      self.w = nnx.Param(w)
+    else:
+      if self._dot_general_spec is not None:
+        (_, contracting_axes), _ = self._dot_general_spec[0]
+      else:
+        contracting_axes = None
+      w_q, w_scale = _quantize(w, quant_dtype, contracting_axes)
+      self.w_q = QuantizedParam(w_q)
+      self.w_scale = QuantizedParam(w_scale)
 
   def __call__(self, x: ArrayLike) -> Array:
-    return jnp.einsum(self.einsum_str, x, self.w.value)
+    if self.quant_dtype is None:
+      w, w_scale = self.w.value, None
+    else:
+      w, w_scale = self.w_q.value, self.w_scale.value
+    return _einsum(
+        x,
+        w,
+        w_scale,
+        einsum_str=self.einsum_str,
+        dot_general_spec=self._dot_general_spec,
+        precision=self.precision,
+        preferred_element_type=self.preferred_element_type,
+    )
 
   @property
   def shape(self) -> Shape:
-    return self.w.value.shape
+    if self.quant_dtype is None:
+      return self.w.value.shape
+    return self.w_q.value.shape
+
+
+class FusedEinsum(nnx.Module):
+  """Several `Einsum`s sharing the same input, computed as one contraction.
+
+  The weights for all `shapes` are concatenated along `axis` into a single
+  parameter `w` (e.g. the Q, K and V projections along the heads axis), and the
+  output of the fused contraction is split back along the corresponding output
+  axis. The shapes must agree on every other axis, and `axis` must not be
+  contracted by `einsum_str`.
+  """
+
+  def __init__(
+      self,
+      einsum_str: str,
+      shapes: Sequence[Shape],
+      *,
+      axis: int = 0,
+      rngs: nnx.Rngs,
+  ):
+    if '->' not in einsum_str or einsum_str.count(',') != 1:
+      raise ValueError(
+          'FusedEinsum requires an explicit two-operand equation, got'
+          f' {einsum_str!r}.'
+      )
+    inputs, out = einsum_str.replace(' ', '').split('->')
+    w_labels = inputs.split(',')[1]
+    rank = len(w_labels)
+    axis = axis % rank
+    if any(len(shape) != rank for shape in shapes) or any(
+        tuple(s[:axis]) + tuple(s[axis + 1 :])
+        != tuple(shapes[0][:axis]) + tuple(shapes[0][axis + 1 :])
+        for s in shapes
+    ):
+      raise ValueError(
+          f'Shapes {shapes} must have rank {rank} and only differ along axis'
+          f' {axis}.'
+      )
+    if w_labels[axis] not in out:
+      raise ValueError(
+          f'Axis {axis} ({w_labels[axis]!r}) is contracted by {einsum_str!r}'
+          ' and cannot be split.'
+      )
+
+    self.einsum_str = einsum_str
+    self.w = nnx.Param(
+        jnp.concatenate(
+            [nn.initializers.normal()(rngs.params(), s) for s in shapes],
+            axis=axis,
+        )
+    )
+    self.split_indices = tuple(
+        itertools.accumulate(s[axis] for s in shapes[:-1])
+    )
+    self._out_axis = out.index(w_labels[axis])
+    self._dot_general_spec = _dot_general_spec(einsum_str)
+
+  def __call__(self, x: ArrayLike) -> tuple[Array, ...]:
+    y = _einsum(
+        x,
+        self.w.value,
+        None,
+        einsum_str=self.einsum_str,
+        dot_general_spec=self._dot_general_spec,
+    )
+    return tuple(jnp.split(y, self.split_indices, axis=self._out_axis))
+
+
+def _normalize_rows(x: Array, epsilon: float = 1e-06) -> Array:
+  """Divides `x` by the root mean square of its last axis.
+
+  The reduction is accumulated in at least float32 for stability, while the
+  result is returned in the input dtype. The mean is folded into the rsqrt,
+  using `rsqrt(sum / D + eps) == sqrt(D) * rsqrt(sum + D * eps)`, so no
+  division is emitted.
+  """
+  dim = x.shape[-1]
+  x32 = x.astype(jnp.promote_types(x.dtype, jnp.float32))
+  sum_sq = jnp.sum(jax.lax.integer_pow(x32, 2), axis=-1, keepdims=True)
+  inv = math.sqrt(dim) * jax.lax.rsqrt(sum_sq + dim * epsilon)
+  return (x32 * inv).astype(x.dtype)
+
+
+def _rms_norm_kernel(x_ref, weight_ref, o_ref):
+  """Pallas kernel normalizing a block of rows of `x_ref` in a single pass."""
+  normed_inputs = _normalize_rows(x_ref[...])
+  o_ref[...] = (normed_inputs * weight_ref[...]).astype(o_ref.dtype)
+
+
+# Rows normalized per pallas program. A multiple of 8 satisfies the TPU
+# (8, 128) tiling rule on the second-to-last axis (the feature axis is always
+# a full block), and a power of two satisfies Triton.
+_PALLAS_BLOCK_ROWS = 8
+
+
+def pallas_supported(dim: int, backend: str | None = None) -> bool:
+  """Whether `rms_norm_pallas` lowers natively for `dim` features on `backend`.
+
+  The feature axis is loaded as a single block, which Mosaic accepts for any
+  size but Triton only for powers of two. Pallas has no native CPU lowering.
+  """
+  backend = backend or jax.default_backend()
+  if backend == 'tpu':
+    return True
+  if backend == 'gpu':
+    return dim & (dim - 1) == 0
+  return False
+
+
+@functools.partial(jax.custom_vjp, nondiff_argnums=(2,))
+def _rms_norm_pallas(x: Array, weight: Array, interpret: bool) -> Array:
+  """`rms_norm_pallas` with its gradient defined by the jnp implementation."""
+  # Pallas is only loaded when the opt-in kernel is actually used.
+  from jax.experimental import pallas as pl  # pylint: disable=g-import-not-at-top
+
+  dim = x.shape[-1]
+  rows = x.reshape(-1, dim)
+  num_rows = rows.shape[0]
+  padded_rows = -(-num_rows // _PALLAS_BLOCK_ROWS) * _PALLAS_BLOCK_ROWS
+  # Zero padding rows normalize to zero and are sliced away below.
+  rows = jnp.pad(rows, ((0, padded_rows - num_rows), (0, 0)))
+  out = pl.pallas_call(
+      _rms_norm_kernel,
+      out_shape=jax.ShapeDtypeStruct(
+          rows.shape, jnp.result_type(x.dtype, weight.dtype)
+      ),
+      grid=(padded_rows // _PALLAS_BLOCK_ROWS,),
+      in_specs=[
+          pl.BlockSpec((_PALLAS_BLOCK_ROWS, dim), lambda i: (i, 0)),
+          pl.BlockSpec((1, dim), lambda i: (0, 0)),
+      ],
+      out_specs=pl.BlockSpec((_PALLAS_BLOCK_ROWS, dim), lambda i: (i, 0)),
+      interpret=interpret,
+  )(rows, weight.reshape(1, dim))
+  return out[:num_rows].reshape(x.shape)
+
+
+def _rms_norm_pallas_fwd(x, weight, interpret):
+  return _rms_norm_pallas(x, weight, interpret), (x, weight)
+
+
+def _rms_norm_pallas_bwd(interpret, residuals, g):
+  del interpret
+  # The backward pass reuses the jnp implementation, which XLA fuses well.
+  # Its cotangents are cast back to the dtype of each primal, as custom_vjp
+  # requires.
+  _, vjp = jax.vjp(_rms_norm, *residuals)
+  return tuple(
+      ct.astype(primal.dtype) for ct, primal in zip(vjp(g), residuals)
+  )
+
+
+_rms_norm_pallas.defvjp(_rms_norm_pallas_fwd, _rms_norm_pallas_bwd)
+
+
+def rms_norm_pallas(
+    x: Array, weight: Array, *, interpret: bool = False
+) -> Array:
+  """Fused RMSNorm: one pallas program per block of rows of the flattened input.
+
+  Matches `RMSNorm`'s jnp path, including its output dtype and gradients, which
+  are computed with the jnp implementation. Outside of `interpret` mode, check
+  `pallas_supported` for the feature size first.
+  """
+  return _rms_norm_pallas(x, weight, interpret)
+
+
+def _quantize(
+    x: Array,
+    dtype: jnp.dtype,
+    axis: int | tuple[int, ...] | None,
+    scale_ub: float | None = None,
+) -> tuple[Array, Array]:
+  """Symmetrically quantizes `x`, with one scale per slice reduced over `axis`.
+
+  Returns the quantized array and float32 scales (reduced axes kept as size 1)
+  such that `quantized * scale ~= x`. Integer dtypes are rounded to the nearest
+  representable value.
+  """
+  amax = jnp.max(jnp.abs(x), axis=axis, keepdims=True).astype(jnp.float32)
+  if scale_ub is not None:
+    amax = jnp.minimum(amax, scale_ub)
+  is_integer = jnp.issubdtype(dtype, jnp.integer)
+  qmax = float(jnp.iinfo(dtype).max if is_integer else jnp.finfo(dtype).max)
+  scale = jnp.maximum(amax / qmax, jnp.finfo(jnp.float32).tiny)
+  quantized = x / scale
+  if is_integer:
+    quantized = jnp.round(quantized)
+  return jnp.clip(quantized, -qmax, qmax).astype(dtype), scale
+
+
+@functools.partial(jax.jit, static_argnames=('dtype', 'scale_ub'))
+def _quantize_rows(
+    x: Array, dtype: jnp.dtype, scale_ub: float | None
+) -> tuple[Array, Array]:
+  """Dynamically quantizes `x` with one scale per row of the last axis."""
+  return _quantize(x, dtype, -1, scale_ub)
+
+
+@jax.jit
+def _rms_norm(x: Array, weight: Array) -> Array:
+  """Compiled `RMSNorm` forward."""
+  # Normalizing a flattened (M, D) view row by row gives XLA a plain rank-2
+  # reduction regardless of the number of leading axes.
+  rows = x.reshape(-1, x.shape[-1])
+  normed_inputs = jax.vmap(_normalize_rows)(rows).reshape(x.shape)
+  # normed_inputs is a rank-K tensor, K > 1 (K is typically 2 or 3). weight
+  # is a rank-1 tensor of shape (D,), which broadcasts against the trailing
+  # feature axis of normed_inputs.
+  return normed_inputs * weight
 
 
 class RMSNorm(nnx.Module):
-  """RMSNorm layer."""
-
-  def __init__(self, dim: int, *, rngs: nnx.Rngs):
-    self.scale = nnx.Param(nn.initializers.zeros_init()(rngs.params(), dim))
-
-  def __call__(self, x: Array) -> Array:
-    var = jnp.mean(jnp.square(x), axis=-1, keepdims=True)
-    normed_inputs = jnp.asarray(x * jnp.reciprocal(jnp.sqrt(var + 1e-06)))
-    # normed_inputs is a rank-K tensor, K > 1 (K is typically 2 or 3). scale is
-    # a rank-1 tensor. To avoid implicit rank-promotion, reshape scale to
-    # a (1, ..., 1, D) tensor, so the rank of scale matches normed_inputs.
-    scale = jnp.expand_dims(self.scale.value, axis=range(len(x.shape) - 1))
-    normed_inputs = normed_inputs * (1 + scale)
-    return normed_inputs
+  """RMSNorm layer.
+
+  If `use_pallas` is set, the fused `rms_norm_pallas` kernel is used where it
+  lowers natively (see `pallas_supported`), or everywhere in interpreter mode
+  if `pallas_interpret` is also set.
+
+  If `quant_out_dtype` is set (e.g. `jnp.float8_e4m3fn`), the output is
+  quantized in the same computation and a `(quantized, scale)` pair is returned
+  instead, with one float32 scale per row such that
+  `quantized * scale ~= output`. `scale_ub` optionally bounds the per-row
+  absolute maximum used to compute the scale.
+  """
+
+  def __init__(
+      self,
+      dim: int,
+      *,
+      use_pallas: bool = False,
+      pallas_interpret: bool = False,
+      quant_out_dtype: jnp.dtype | None = None,
+      scale_ub: float | None = None,
+      rngs: nnx.Rngs,
+  ):
+    # Stored as `1 + scale` of the original Gemma parameterization so the
+    # offset is not re-added on every call.
+    self.weight = nnx.Param(nn.initializers.ones_init()(rngs.params(), dim))
+    self.use_pallas = use_pallas
+    self.pallas_interpret = pallas_interpret
+    self.quant_out_dtype = quant_out_dtype
+    self.scale_ub = scale_ub
+
+  def __call__(self, x: Array) -> Array | tuple[Array, Array]:
+    normed_inputs = self._normalize(x)
+    if self.quant_out_dtype is None:
+      return normed_inputs
+    return _quantize_rows(normed_inputs, self.quant_out_dtype, self.scale_ub)
+
+  def _normalize(self, x: Array) -> Array:
+    # Feature sizes or backends the kernel cannot lower to use the jnp path.
+    if self.use_pallas and (
+        self.pallas_interpret or pallas_supported(x.shape[-1])
+    ):
+      return rms_norm_pallas(
+          x, self.weight.value, interpret=self.pallas_interpret
+      )
+    return _rms_norm(x, self.weight.value)
@@ -18,6 +18,7 @@ from absl.testing import absltest
 from absl.testing import parameterized
 from flax import nnx
 import layers
+import jax
 import jax.numpy as jnp
 import numpy as np
 
@@ -44,6 +45,138 @@ class EinsumTest(parameterized.TestCase):
     )
     self.assertEqual(output.shape, expected_shape)
 
+  @parameterized.parameters(
+      dict(
+          eqn='TD,SNDH->STNH',
+          inputs_shape=(1, 4),
+          params_shape=(3, 2, 4, 3),
+      ),
+      dict(
+          eqn='BTNH,NHD->BTD',
+          inputs_shape=(2, 3, 4, 5),
+          params_shape=(4, 5, 6),
+      ),
+      dict(
+          eqn='bij,bjk->bik',
+          inputs_shape=(2, 3, 4),
+          params_shape=(2, 4, 5),
+      ),
+      dict(
+          eqn='ij,jk->k',
+          inputs_shape=(3, 4),
+          params_shape=(4, 5),
+      ),
+  )
+  def test_einsum_matches_jnp(self, eqn, inputs_shape, params_shape):
+    einsum = layers.Einsum(eqn, params_shape, rngs=nnx.Rngs(params=0))
+    x = jax.random.normal(jax.random.key(0), inputs_shape)
+    np.testing.assert_allclose(
+        einsum(x), jnp.einsum(eqn, x, einsum.w.value), rtol=1e-6, atol=1e-6
+    )
+
+  @parameterized.parameters(
+      dict(
+          eqn='BTD,NDH->BTNH',
+          inputs_shape=(2, 3, 4),
+          params_shape=(3, 4, 5),
+          preferred_element_type=None,
+      ),
+      dict(
+          eqn='BTD,NDH->BTNH',
+          inputs_shape=(2, 3, 4),
+          params_shape=(3, 4, 5),
+          preferred_element_type=jnp.float32,
+      ),
+      dict(
+          eqn='ij,jk->k',
+          inputs_shape=(3, 4),
+          params_shape=(4, 5),
+          preferred_element_type=None,
+      ),
+  )
+  def test_einsum_precision(
+      self, eqn, inputs_shape, params_shape, preferred_element_type
+  ):
+    precision = jax.lax.Precision.HIGHEST
+    einsum = layers.Einsum(
+        eqn,
+        params_shape,
+        precision=precision,
+        preferred_element_type=preferred_element_type,
+        rngs=nnx.Rngs(params=0),
+    )
+    x = jax.random.normal(jax.random.key(0), inputs_shape, jnp.bfloat16)
+    expected = jnp.einsum(
+        eqn,
+        x,
+        einsum.w.value,
+        precision=precision,
+        preferred_element_type=preferred_element_type,
+    )
+    output = einsum(x)
+    self.assertEqual(output.dtype, expected.dtype)
+    np.testing.assert_allclose(output, expected, rtol=tol, atol=tol)
+
+  @parameterized.parameters(
+      dict(quant_dtype=jnp.int8, rtol=1e-2),
+      dict(quant_dtype=jnp.float8_e4m3fn, rtol=7e-2),
+  )
+  def test_einsum_quantized(self, quant_dtype, rtol):
+    eqn, params_shape = 'BTD,NDH->BTNH', (4, 16, 8)
+    einsum = layers.Einsum(eqn, params_shape, rngs=nnx.Rngs(params=0))
+    einsum_q = layers.Einsum(
+        eqn, params_shape, quant_dtype=quant_dtype, rngs=nnx.Rngs(params=0)
+    )
+    self.assertEqual(einsum_q.w_q.value.dtype, quant_dtype)
+    self.assertEqual(einsum_q.w_scale.value.shape, (4, 1, 8))
+    self.assertEqual(einsum_q.shape, params_shape)
+    x = jax.random.normal(jax.random.key(0), (2, 3, 16))
+    np.testing.assert_allclose(
+        einsum_q(x), einsum(x), rtol=rtol, atol=rtol * 0.1
+    )
+    # The weight is dequantized in the activation dtype.
+    self.assertEqual(einsum_q(x.astype(jnp.bfloat16)).dtype, jnp.bfloat16)
+    # Quantized weights are not trainable parameters.
+    self.assertEmpty(nnx.state(einsum_q, nnx.Param))
+    x_grad = jax.grad(lambda x: jnp.sum(einsum_q(x)))(x)
+    self.assertEqual(x_grad.shape, x.shape)
+
+  @parameterized.parameters(
+      dict(
+          eqn='TD,SNDH->STNH',
+          inputs_shape=(1, 4),
+          params_shape=(3, 2, 4, 3),
+      ),
+      dict(
+          eqn='bij,bjk->bik',
+          inputs_shape=(2, 3, 4),
+          params_shape=(2, 4, 5),
+      ),
+      dict(
+          eqn='bi,bj->bij',
+          inputs_shape=(2, 3),
+          params_shape=(2, 4),
+      ),
+  )
+  def test_dot_general_as_matmul(self, eqn, inputs_shape, params_shape):
+    dims, _ = layers._dot_general_spec(eqn)
+    x = jax.random.normal(jax.random.key(0), inputs_shape)
+    w = jax.random.normal(jax.random.key(1), params_shape)
+    np.testing.assert_allclose(
+        layers._dot_general_as_matmul(x, w, dims),
+        jax.lax.dot_general(x, w, dims),
+        rtol=1e-6,
+        atol=1e-6,
+    )
+
+  @parameterized.parameters(
+      dict(eqn='BTD,NDH->BTNH', params_shape=(4, 8)),
+      dict(eqn='BTD,NDH->BTNH', params_shape=(4, 8, 3, 2)),
+  )
+  def test_einsum_invalid_shape(self, eqn, params_shape):
+    with self.assertRaises(ValueError):
+      layers.Einsum(eqn, params_shape, rngs=nnx.Rngs(params=0))
+
   @parameterized.parameters(
       dict(
           shape=(1, 4),
@@ -57,6 +190,51 @@ class EinsumTest(parameterized.TestCase):
     self.assertEqual(einsum.shape, shape)
 
 
+class AbstractInitTest(absltest.TestCase):
+
+  def test_abstract_init(self):
+    # Layers are built with `nnx.eval_shape` when loading checkpoints, which
+    # must not materialize any weights.
+    einsum = nnx.eval_shape(
+        lambda: layers.Einsum(
+            'BTD,NDH->BTNH',
+            (4, 16, 8),
+            quant_dtype=jnp.int8,
+            rngs=nnx.Rngs(params=0),
+        )
+    )
+    rmsnorm = nnx.eval_shape(lambda: layers.RMSNorm(8, rngs=nnx.Rngs(params=0)))
+    for param in (einsum.w_q, einsum.w_scale, rmsnorm.weight):
+      self.assertIsInstance(param.value, jax.ShapeDtypeStruct)
+    self.assertEqual(einsum.shape, (4, 16, 8))
+
+
+class FusedEinsumTest(parameterized.TestCase):
+
+  def test_fused_einsum(self):
+    eqn = 'BTD,NDH->BTNH'
+    shapes = [(4, 8, 3), (2, 8, 3), (2, 8, 3)]
+    fused = layers.FusedEinsum(eqn, shapes, rngs=nnx.Rngs(params=0))
+    x = jax.random.normal(jax.random.key(0), (2, 5, 8))
+    outputs = fused(x)
+    self.assertLen(outputs, 3)
+    weights = jnp.split(fused.w.value, fused.split_indices, axis=0)
+    for output, w, shape in zip(outputs, weights, shapes):
+      self.assertEqual(output.shape, (2, 5, shape[0], 3))
+      np.testing.assert_allclose(
+          output, jnp.einsum(eqn, x, w), rtol=1e-6, atol=1e-6
+      )
+
+  @parameterized.parameters(
+      dict(eqn='BTD,NDH->BTNH', shapes=[(4, 8, 3), (2, 7, 3)], axis=0),
+      dict(eqn='BTD,NDH->BTNH', shapes=[(4, 8, 3), (4, 8, 3)], axis=1),
+      dict(eqn='BTD->BT', shapes=[(4, 8, 3)], axis=0),
+  )
+  def test_fused_einsum_invalid(self, eqn, shapes, axis):
+    with self.assertRaises(ValueError):
+      layers.FusedEinsum(eqn, shapes, axis=axis, rngs=nnx.Rngs(params=0))
+
+
 class RMSNormTest(parameterized.TestCase):
   @parameterized.parameters(dict(x=[0.1, 0.2], expected=[0.6324429, 1.2648858]))
   def test_rmsnorm(self, x, expected):
@@ -65,6 +243,87 @@ class RMSNormTest(parameterized.TestCase):
     output = rmsnorm(x)
     np.testing.assert_array_equal(output, jnp.array([expected]))
 
+  def test_rmsnorm_remat(self):
+    x = jax.random.normal(jax.random.key(0), (2, 3, 8))
+    rmsnorm = layers.RMSNorm(x.shape[-1], rngs=nnx.Rngs(params=0))
+
+    def loss(rmsnorm, x):
+      return jnp.sum(rmsnorm(x) ** 2)
+
+    grads = nnx.grad(loss)(rmsnorm, x)
+    remat_grads = nnx.grad(nnx.remat(loss))(rmsnorm, x)
+    np.testing.assert_allclose(
+        remat_grads['weight'].value, grads['weight'].value, rtol=1e-6
+    )
+
+  def test_rmsnorm_bfloat16(self):
+    x = jax.random.normal(jax.random.key(0), (2, 3, 8))
+    rmsnorm = layers.RMSNorm(x.shape[-1], rngs=nnx.Rngs(params=0))
+    output = rmsnorm(x.astype(jnp.bfloat16))
+    self.assertEqual(output.dtype, jnp.float32)
+    np.testing.assert_allclose(output, rmsnorm(x), rtol=1e-2, atol=1e-2)
+
+  @parameterized.parameters(
+      dict(dtype=jnp.float32, shape=(2, 3, 8), tol=1e-5),
+      dict(dtype=jnp.bfloat16, shape=(2, 3, 8), tol=1e-2),
+      dict(dtype=jnp.float32, shape=(5, 96), tol=1e-5),
+  )
+  def test_rmsnorm_pallas(self, dtype, shape, tol):
+    x = jax.random.normal(jax.random.key(0), shape).astype(dtype)
+    rmsnorm = layers.RMSNorm(shape[-1], rngs=nnx.Rngs(params=0))
+    rmsnorm_pallas = layers.RMSNorm(
+        shape[-1], use_pallas=True, pallas_interpret=True, rngs=nnx.Rngs(0)
+    )
+    weight = jax.random.normal(jax.random.key(1), shape[-1:])
+    rmsnorm.weight.value = weight
+    rmsnorm_pallas.weight.value = weight
+    output = rmsnorm_pallas(x)
+    expected = rmsnorm(x)
+    self.assertEqual(output.dtype, expected.dtype)
+    np.testing.assert_allclose(output, expected, rtol=tol, atol=tol)
+
+    def loss(rmsnorm, x):
+      return jnp.sum(jnp.sin(rmsnorm(x)))
+
+    grads, x_grad = nnx.grad(loss, argnums=(0, 1))(rmsnorm_pallas, x)
+    expected_grads, expected_x_grad = nnx.grad(loss, argnums=(0, 1))(
+        rmsnorm, x
+    )
+    self.assertEqual(grads['weight'].value.dtype, jnp.float32)
+    np.testing.assert_allclose(
+        grads['weight'].value,
+        expected_grads['weight'].value,
+        rtol=tol,
+        atol=tol,
+    )
+    self.assertEqual(x_grad.dtype, dtype)
+    self.assertEqual(expected_x_grad.dtype, dtype)
+    np.testing.assert_allclose(
+        x_grad.astype(jnp.float32),
+        expected_x_grad.astype(jnp.float32),
+        rtol=tol,
+        atol=tol,
+    )
+
+  def test_pallas_supported(self):
+    self.assertTrue(layers.pallas_supported(3072, 'tpu'))
+    self.assertTrue(layers.pallas_supported(2048, 'gpu'))
+    self.assertFalse(layers.pallas_supported(3072, 'gpu'))
+    self.assertFalse(layers.pallas_supported(2048, 'cpu'))
+
+  def test_rmsnorm_quant_out(self):
+    x = jax.random.normal(jax.random.key(0), (2, 3, 8))
+    rmsnorm = layers.RMSNorm(x.shape[-1], rngs=nnx.Rngs(params=0))
+    rmsnorm_fp8 = layers.RMSNorm(
+        x.shape[-1], quant_out_dtype=jnp.float8_e4m3fn, rngs=nnx.Rngs(params=0)
+    )
+    quantized, scale = rmsnorm_fp8(x)
+    self.assertEqual(quantized.dtype, jnp.float8_e4m3fn)
+    self.assertEqual(scale.shape, (2, 3, 1))
+    np.testing.assert_allclose(
+        quantized.astype(jnp.float32) * scale, rmsnorm(x), rtol=0.07
+    )
+
 
 if __name__ == '__main__':
   absltest.main()
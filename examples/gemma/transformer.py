@@ -221,6 +221,8 @@ def _map_linen_var_names(key: tuple[str, ...]) -> tuple[str | int, ...]:
     elif k == 'linear':
       new_key.append('down_proj')
       new_key.append('kernel')
+    elif k == 'scale':
+      new_key.append('weight')
     else:
       new_key.append(k)
 
@@ -233,12 +235,15 @@ def _assign_linen_params_to_nnx_state(
     val: Any,
     transpose_gating_einsum: bool,
 ) -> dict[tuple[str, ...], Any]:
-  """Splits and maybe transposes gate_proj."""
+  """Splits and maybe transposes gate_proj, and offsets RMSNorm scales."""
   if 'gate_proj' in mapped_path:
     if transpose_gating_einsum:
       val = jnp.swapaxes(val, 1, 2)
     state[mapped_path].value = val[0]
     state[mapped_path[:-2] + ('up_proj', 'kernel')].value = val[1]
+  elif mapped_path[-1] == 'weight':
+    # RMSNorm stores `1 + scale` instead of the linen `scale`.
+    state[mapped_path].value = 1 + val
   else:
     state[mapped_path].value = val
   return state
@@ -254,6 +259,12 @@ class Transformer(nnx.Module):
       config: None | TransformerConfig = None,
       sow_config: sow_lib.SowConfig = sow_lib.SowConfig(),
   ) -> Transformer:
+    """Builds a transformer from linen checkpoint `params`.
+
+    The module is first constructed abstractly with `nnx.eval_shape`, so no
+    random initialization is performed for weights that are immediately
+    overwritten by the checkpoint.
+    """
     if config is None:
       config = TransformerConfig.from_params(params)
     assign_val_fn = functools.partial(
@@ -16,6 +16,7 @@
 
 import dataclasses
 import functools
+import math
 from typing import Any
 from collections.abc import Iterable
 
@@ -44,17 +45,73 @@ map_variables = transforms.map_variables
 
 def _canonicalize_axes(rank: int, axes: Axes) -> tuple[int, ...]:
   """Returns a tuple of deduplicated, sorted, and positive axes."""
+  if isinstance(axes, tuple) and all(
+    0 <= a < b for a, b in zip(axes, axes[1:] + (rank,))
+  ):
+    # already canonical, e.g. when passed on from a previous call
+    return axes
   if not isinstance(axes, Iterable):
     axes = (axes,)
-  return tuple({rank + axis if axis < 0 else axis for axis in axes})
+  return _canonical_axes(rank, tuple(axes))
+
+
+@functools.lru_cache
+def _canonical_axes(rank: int, axes: tuple[int, ...]) -> tuple[int, ...]:
+  """Memoized :func:`_canonicalize_axes` for a tuple of axes.
+
+  Modules pass their axes as written, e.g. ``-1``, on every call. Caching the
+  result per ``(rank, axes)`` returns the same canonical tuple each time, which
+  is then a cheap, stable static argument for the jitted normalization
+  functions.
+  """
+  return tuple(sorted({rank + axis if axis < 0 else axis for axis in axes}))
+
+
+def _abs_sq_complex(x):
+  """Computes the elementwise |x|^2 of a complex array."""
+  return lax.square(lax.real(x)) + lax.square(lax.imag(x))
+
 
+def _mean(xs, axes, mask=None):
+  """Computes the means of the arrays ``xs`` over ``axes``.
 
-def _abs_sq(x):
-  """Computes the elementwise square of the absolute value |x|^2."""
-  if jnp.iscomplexobj(x):
-    return lax.square(lax.real(x)) + lax.square(lax.imag(x))
+  Each mean is a plain ``jnp.sum``, which XLA's multi-output fusion already
+  computes in one traversal of the input, e.g. for ``E[x]`` and ``E[|x|^2]``,
+  and which stays a linear reduction under differentiation. Like
+  ``jnp.mean``, half precision inputs are accumulated in float32. Masked out
+  entries are selected away rather than multiplied by zero, so they may hold
+  non-finite padding; reductions that are masked out entirely have a mean of
+  zero.
+  """
+  if mask is None:
+    count = math.prod(xs[0].shape[axis] for axis in axes)
   else:
-    return lax.square(x)
+    mask = jnp.broadcast_to(mask, xs[0].shape)
+    xs = tuple(jnp.where(mask, x, 0) for x in xs)
+    count = jnp.maximum(mask.sum(axes, dtype=jnp.float32), 1.0)
+  return tuple(
+    jnp.asarray(
+      jnp.sum(x, axes, dtype=jnp.promote_types(x.dtype, jnp.float32)) / count,
+      x.dtype,
+    )
+    for x in xs
+  )
+
+
+def _shift(x, axes, mask=None):
+  """Returns an element of ``x`` per reduction to shift ``x`` by.
+
+  The first element along ``axes`` is used (zero if it is masked out), with
+  the reduced axes kept. Its gradient is stopped, since the shift cancels out
+  of the statistics.
+  """
+  index = tuple(
+    slice(0, 1) if axis in axes else slice(None) for axis in range(x.ndim)
+  )
+  x0 = x[index]
+  if mask is not None:
+    x0 = jnp.where(jnp.broadcast_to(mask, x.shape)[index], x0, 0)
+  return lax.stop_gradient(x0)
 
 
 def _compute_stats(
@@ -67,6 +124,7 @@ def _compute_stats(
     use_fast_variance: bool = True,
     mask: Array | None = None,
     force_float32_reductions=True,
+    epsilon: float | None = None,
 ):
   """Computes mean and variance statistics.
 
@@ -75,7 +133,12 @@ def _compute_stats(
     in half precision training.
   - If `use_fast_variance` is `True`, mean and variance are computed using
     Var = E[|x|^2] - |E[x]|^2, instead of Var = E[|x - E[x]|^2]), in a single
-    XLA fusion.
+    XLA fusion. Without `axis_name`, x is first shifted by one of its
+    elements to avoid catastrophic cancellation. Otherwise the mean is
+    subtracted in a second pass over `x`. A single-pass (Welford) reduction
+    is deliberately not used there, as its running mean is rounded at the
+    scale of `x` and loses the accuracy of the two-pass form on inputs with
+    a large offset.
   - Clips negative variances to zero which can happen due to
     roundoff errors. This avoids downstream NaNs.
   - Supports averaging across a parallel axis and subgroups of a parallel axis
@@ -92,17 +155,19 @@ def _compute_stats(
       and XLA:SPMD will insert the necessary collectives.
     axis_index_groups: Optional axis indices.
     use_mean: If true, calculate the mean from the input and use it when
-      computing the variance. If false, set the mean to zero and compute the
-      variance without subtracting the mean.
+      computing the variance. If false, compute the variance without
+      subtracting the mean and return ``None`` for the mean.
     use_fast_variance: If true, use a faster, but less numerically stable,
       calculation for the variance.
     mask: Binary array of shape broadcastable to `inputs` tensor, indicating the
       positions for which the mean and variance should be computed.
     force_float32_reductions: If false, this will skip float32 promotion and use
       the input dtype or inherited dtype from ``x``.
+    epsilon: Optional normalization epsilon, which is then already added to
+      the returned variance.
 
   Returns:
-    A pair ``(mean, var)``.
+    A pair ``(mean, var)``, with ``mean=None`` if ``use_mean`` is false.
   """
   if dtype is None:
     dtype = jnp.result_type(x)
@@ -112,115 +177,437 @@ def _compute_stats(
     dtype = jnp.promote_types(dtype, jnp.float32)
   x = jnp.asarray(x, dtype)
   axes = _canonicalize_axes(x.ndim, axes)
+  # |x|^2, dispatched once on the (trace-time) dtype of x
+  abs_sq = _abs_sq_complex if jnp.iscomplexobj(x) else lax.square
 
   def maybe_distributed_mean(*xs, mask=None):
-    mus = tuple(x.mean(axes, where=mask) for x in xs)
-    if axis_name is None:
-      return mus if len(xs) > 1 else mus[0]
-    else:
-      # In the distributed case we stack multiple arrays to speed comms.
-      if len(xs) > 1:
-        reduced_mus = lax.pmean(
-          jnp.stack(mus, axis=0),
-          axis_name,
-          axis_index_groups=axis_index_groups,
-        )
-        return tuple(reduced_mus[i] for i in range(len(xs)))
-      else:
-        return lax.pmean(mus[0], axis_name, axis_index_groups=axis_index_groups)
+    mus = _mean(xs, axes, mask=mask)
+    if axis_name is not None:
+      # ``pmean`` over the whole tuple reduces all the means in one collective,
+      # without first stacking them into a single (dtype promoted) array.
+      mus = lax.pmean(mus, axis_name, axis_index_groups=axis_index_groups)
+    return mus if len(xs) > 1 else mus[0]
 
   if use_mean:
     if use_fast_variance:
-      mu, mu2 = maybe_distributed_mean(x, _abs_sq(x), mask=mask)
-      # mean2 - _abs_sq(mean) is not guaranteed to be non-negative due
+      if axis_name is None:
+        # Shifting x by one of its elements keeps E[|x|^2] - |E[x]|^2 from
+        # cancelling catastrophically when |E[x]| is large compared to the
+        # spread of x. In the distributed case the shift would have to agree
+        # across devices, so it is skipped there.
+        x0 = _shift(x, axes, mask=mask)
+        x = x - x0
+      if jnp.iscomplexobj(x):
+        # Split x into its real and imaginary parts once, so that all three
+        # moments are reduced as real arrays in the same variadic reduction.
+        xr, xi = lax.real(x), lax.imag(x)
+        mu_r, mu_i, mu2 = maybe_distributed_mean(
+          xr, xi, lax.square(xr) + lax.square(xi), mask=mask
+        )
+        mu = lax.complex(mu_r, mu_i)
+        mu_sq = lax.square(mu_r) + lax.square(mu_i)
+      else:
+        mu, mu2 = maybe_distributed_mean(x, lax.square(x), mask=mask)
+        mu_sq = lax.square(mu)
+      # mean2 - abs_sq(mean) is not guaranteed to be non-negative due
       # to floating point round-off errors.
-      var = jnp.maximum(0.0, mu2 - _abs_sq(mu))
+      var = jnp.maximum(0.0, mu2 - mu_sq)
+      if axis_name is None:
+        mu = mu + jnp.squeeze(x0, axes)
     else:
       mu = maybe_distributed_mean(x, mask=mask)
       var = maybe_distributed_mean(
-        _abs_sq(x - jnp.expand_dims(mu, axes)), mask=mask
+        abs_sq(x - jnp.expand_dims(mu, axes)), mask=mask
       )
   else:
-    var = maybe_distributed_mean(_abs_sq(x), mask=mask)
-    mu = jnp.zeros_like(var)
+    var = maybe_distributed_mean(abs_sq(x), mask=mask)
+    mu = None
+  if epsilon is not None:
+    var = var + epsilon
   return mu, var
 
 
+def _as_feature_param(param, feature_shape):
+  """Returns ``param`` in a shape that broadcasts against ``feature_shape``.
+
+  Parameters of trailing feature axes, e.g. the ``(features,)`` scale of a
+  LayerNorm over the last axis, already broadcast as they are, so they are
+  only reshaped when the feature axes are not the trailing ones.
+  """
+  if param.ndim > len(feature_shape) or param.shape != tuple(
+    feature_shape[len(feature_shape) - param.ndim :]
+  ):
+    param = param.reshape(feature_shape)
+  return param
+
+
 def _normalize(
-  mdl: Module,
   x: Array,
-  mean: Array,
+  mean: Array | None,
   var: Array,
+  scale: Array | None,
+  bias: Array | None,
   reduction_axes: Axes,
   feature_axes: Axes,
   dtype: Dtype | None,
-  param_dtype: Dtype,
   epsilon: float,
-  use_bias: bool,
-  use_scale: bool,
-  bias_init: Initializer,
-  scale_init: Initializer,
-  force_float32_reductions: bool = True
+  var_has_epsilon: bool = False,
 ):
   """Normalizes the input of a normalization layer and optionally applies a learned scale and bias.
 
   Arguments:
-    mdl: Module to apply the normalization in (normalization params will reside
-      in this module).
     x: The input.
-    mean: Mean to use for normalization.
+    mean: Mean to use for normalization, or ``None`` to normalize ``x``
+      without subtracting a mean, e.g. for RMSNorm.
     var: Variance to use for normalization.
+    scale: Optional learned scale, of the shape of the feature axes.
+    bias: Optional learned bias, of the shape of the feature axes.
     reduction_axes: The axes in ``x`` to reduce.
     feature_axes: Axes containing features. A separate bias and scale is learned
       for each specified feature.
     dtype: The dtype of the result (default: infer from input and params).
-    param_dtype: The dtype of the parameters.
     epsilon: Normalization epsilon.
-    use_bias: If true, add a bias term to the output.
-    use_scale: If true, scale the output.
-    bias_init: Initialization function for the bias term.
-    scale_init: Initialization function for the scaling function.
-    force_float32_reductions: If false, the scale and bias parameters use the
-      param_dtype. Otherwise, they will have at least float32 precision due to
-      the mean and var being promoted to float32.
+    var_has_epsilon: If true, ``epsilon`` was already added to ``var`` by
+      :func:`_compute_stats`.
 
   Returns:
     The normalized input.
   """
   reduction_axes = _canonicalize_axes(x.ndim, reduction_axes)
   feature_axes = _canonicalize_axes(x.ndim, feature_axes)
+  stats_shape = list(x.shape)
+  for ax in reduction_axes:
+    stats_shape[ax] = 1
   feature_shape = [1] * x.ndim
-  reduced_feature_shape = []
   for ax in feature_axes:
     feature_shape[ax] = x.shape[ax]
-    reduced_feature_shape.append(x.shape[ax])
+  # Broadcast all the operands of the affine transform to a common shape so
+  # that ``scale * rsqrt(var + epsilon)`` is only computed at that size and
+  # the transform is a single elementwise pass over ``x``.
+  broadcast_shape = tuple(map(max, stats_shape, feature_shape))
+  if mean is not None:
+    mean = jnp.broadcast_to(
+      jnp.expand_dims(mean, reduction_axes), broadcast_shape
+    )
+  var = jnp.broadcast_to(
+    jnp.expand_dims(var, reduction_axes), broadcast_shape
+  )
+  if scale is not None:
+    scale = _as_feature_param(scale, feature_shape)
+  if bias is not None:
+    bias = _as_feature_param(bias, feature_shape)
+
+  dtype = dtypes.canonicalize_dtype(
+    *(arg for arg in (x, scale, bias) if arg is not None), dtype=dtype
+  )
+  # The affine transform runs in the (at least float32) precision of the
+  # statistics and is only cast at the end: rounding ``mean`` to e.g. bfloat16
+  # before ``x - mean`` would lose the low bits that the subtraction exposes
+  # when ``|mean|`` is large compared to the spread of ``x``.
+  mul = lax.rsqrt(var if var_has_epsilon else var + epsilon)
+  if scale is not None:
+    mul = mul * jnp.broadcast_to(scale, broadcast_shape)
+  if mean is not None:
+    x = x - mean
+  y = x * mul
+  if bias is not None:
+    y = y + jnp.broadcast_to(bias, broadcast_shape)
+  # ``y`` is already in ``dtype`` whenever the inputs are, e.g. float32 inputs
+  # and params, so only cast when the result type actually differs.
+  if y.dtype != dtype:
+    y = y.astype(dtype)
+  return y
+
+
+def _normalization_params(
+  mdl: Module,
+  x: Array,
+  feature_axes: Axes,
+  param_dtype: Dtype,
+  use_bias: bool,
+  use_scale: bool,
+  bias_init: Initializer,
+  scale_init: Initializer,
+  force_float32_reductions: bool = True,
+):
+  """Creates the learned scale and bias of a normalization layer.
+
+  Arguments:
+    mdl: Module to create the params in.
+    x: The input.
+    feature_axes: Axes containing features. A separate bias and scale is learned
+      for each specified feature.
+    param_dtype: The dtype of the parameters.
+    use_bias: If true, create a bias term.
+    use_scale: If true, create a scale term.
+    bias_init: Initialization function for the bias term.
+    scale_init: Initialization function for the scaling function.
+    force_float32_reductions: If false, the scale and bias parameters use the
+      param_dtype. Otherwise, they will have at least float32 precision due to
+      the mean and var being promoted to float32.
 
-  mean = jnp.expand_dims(mean, reduction_axes)
-  var = jnp.expand_dims(var, reduction_axes)
-  y = x - mean
-  mul = lax.rsqrt(var + epsilon)
-  args = [x]
+  Returns:
+    A pair ``(scale, bias)``, where disabled terms are ``None``.
+  """
+  feature_axes = _canonicalize_axes(x.ndim, feature_axes)
+  reduced_feature_shape = [x.shape[ax] for ax in feature_axes]
+  scale = bias = None
   if use_scale:
-    scale = mdl.param(
-      'scale', scale_init, reduced_feature_shape, param_dtype
-    ).reshape(feature_shape)
+    scale = mdl.param('scale', scale_init, reduced_feature_shape, param_dtype)
     if not force_float32_reductions:
       scale = jnp.asarray(scale, param_dtype)
-    mul *= scale
-    args.append(scale)
-  y *= mul
   if use_bias:
-    bias = mdl.param(
-      'bias', bias_init, reduced_feature_shape, param_dtype
-    ).reshape(feature_shape)
+    bias = mdl.param('bias', bias_init, reduced_feature_shape, param_dtype)
     if not force_float32_reductions:
       bias = jnp.asarray(bias, param_dtype)
-    y += bias
-    args.append(bias)
-  dtype = dtypes.canonicalize_dtype(*args, dtype=dtype)
-  return jnp.asarray(y, dtype)
+  return scale, bias
+
+
+@functools.partial(
+  jax.jit,
+  static_argnames=(
+    'reduction_axes',
+    'feature_axes',
+    'dtype',
+    'epsilon',
+    'use_mean',
+    'use_fast_variance',
+    'axis_name',
+    'axis_index_groups',
+    'group_size',
+    'force_float32_reductions',
+  ),
+)
+def _fused_norm_forward(
+  x: Array,
+  scale: Array | None,
+  bias: Array | None,
+  mask: Array | None = None,
+  *,
+  reduction_axes: tuple[int, ...],
+  feature_axes: tuple[int, ...],
+  dtype: Dtype | None,
+  epsilon: float,
+  use_mean: bool = True,
+  use_fast_variance: bool = True,
+  axis_name: str | None = None,
+  axis_index_groups: Any = None,
+  group_size: int | None = None,
+  force_float32_reductions: bool = True,
+):
+  """Computes the statistics of ``x`` and normalizes it in a single jit.
+
+  Tracing :func:`_compute_stats` and :func:`_normalize` together lets XLA fuse
+  the reductions and the affine transform into one kernel, instead of
+  materializing the intermediate ``x - mean`` and ``mul`` arrays. There is
+  no separate dispatch to a hand-written (e.g. Pallas or cuDNN) LayerNorm or
+  RMSNorm kernel: JAX exposes no public fused normalization op to dispatch
+  to, and this jit already hands XLA the whole normalization to fuse on
+  every backend.
+
+  Arguments:
+    x: The input.
+    scale: Optional learned scale.
+    bias: Optional learned bias.
+    mask: Optional mask passed to :func:`_compute_stats`.
+    reduction_axes: Canonical axes in ``x`` to reduce.
+    feature_axes: Canonical axes of ``x`` containing features.
+    dtype: The dtype of the result (default: infer from input and params).
+    epsilon: Normalization epsilon.
+    use_mean: If false, the mean is not subtracted (see :func:`_compute_stats`).
+    use_fast_variance: If true, use a faster, but less numerically stable,
+      calculation for the variance.
+    axis_name: Optional name for the pmapped axis to compute mean over.
+    axis_index_groups: Optional axis indices, as a tuple of tuples.
+    group_size: If set, the last axis of ``x`` is split into groups of
+      ``group_size`` channels and the statistics are also reduced over each
+      group, as in :class:`GroupNorm`.
+    force_float32_reductions: If false, this will skip float32 promotion of
+      the statistics.
+
+  Returns:
+    The normalized input.
+  """
+  shape = x.shape
+  if group_size is not None:
+    # Normalize in the grouped layout, where the statistics broadcast over the
+    # channels of each group, so they never need to be repeated per channel.
+    x = x.reshape(shape[:-1] + (-1, group_size))
+    reduction_axes = reduction_axes + (x.ndim - 1,)
+    feature_axes = (x.ndim - 2, x.ndim - 1)
+    if mask is not None:
+      mask = mask.reshape(mask.shape[:-1] + (-1, group_size))
+  mean, var = _compute_stats(
+    x,
+    reduction_axes,
+    dtype,
+    axis_name,
+    axis_index_groups,
+    use_mean=use_mean,
+    use_fast_variance=use_fast_variance,
+    mask=mask,
+    force_float32_reductions=force_float32_reductions,
+    epsilon=epsilon,
+  )
+  y = _normalize(
+    x,
+    mean,
+    var,
+    scale,
+    bias,
+    reduction_axes,
+    feature_axes,
+    dtype,
+    epsilon,
+    var_has_epsilon=True,
+  )
+  return y.reshape(shape)
+
+
+@functools.partial(
+  jax.jit,
+  static_argnames=(
+    'momentum',
+    'reduction_axes',
+    'feature_axes',
+    'dtype',
+    'epsilon',
+    'use_fast_variance',
+    'axis_name',
+    'axis_index_groups',
+    'force_float32_reductions',
+  ),
+)
+def _batch_norm_train_step(
+  x: Array,
+  running_mean: Array,
+  running_var: Array,
+  scale: Array | None,
+  bias: Array | None,
+  mask: Array | None = None,
+  *,
+  momentum: float,
+  reduction_axes: tuple[int, ...],
+  feature_axes: tuple[int, ...],
+  dtype: Dtype | None,
+  epsilon: float,
+  use_fast_variance: bool = True,
+  axis_name: str | None = None,
+  axis_index_groups: Any = None,
+  force_float32_reductions: bool = True,
+):
+  """Normalizes ``x`` with its batch statistics and updates the running ones.
+
+  Like :func:`_fused_norm_forward`, this traces the statistics and the
+  normalization in one jit. The exponential moving averages are computed in it
+  as well, so XLA can fuse them with the reductions rather than launching
+  separate kernels for each update. Epsilon is not folded into the variance
+  here, since the variance also feeds the running average.
+
+  Arguments:
+    x: The input.
+    running_mean: The running average of the mean.
+    running_var: The running average of the variance.
+    scale: Optional learned scale.
+    bias: Optional learned bias.
+    mask: Optional mask passed to :func:`_compute_stats`.
+    momentum: Decay rate of the running averages.
+    reduction_axes: Canonical axes in ``x`` to reduce.
+    feature_axes: Canonical axes of ``x`` containing features.
+    dtype: The dtype of the result (default: infer from input and params).
+    epsilon: Normalization epsilon.
+    use_fast_variance: If true, use a faster, but less numerically stable,
+      calculation for the variance.
+    axis_name: Optional name for the pmapped axis to compute mean over.
+    axis_index_groups: Optional axis indices, as a tuple of tuples.
+    force_float32_reductions: If false, this will skip float32 promotion of
+      the statistics.
+
+  Returns:
+    A tuple ``(new_running_mean, new_running_var, y)``.
+  """
+  mean, var = _compute_stats(
+    x,
+    reduction_axes,
+    dtype,
+    axis_name,
+    axis_index_groups,
+    use_fast_variance=use_fast_variance,
+    mask=mask,
+    force_float32_reductions=force_float32_reductions,
+  )
+  y = _normalize(
+    x, mean, var, scale, bias, reduction_axes, feature_axes, dtype, epsilon
+  )
+  # ``momentum`` is static, so ``1 - momentum`` is a trace-time constant and
+  # each update is a single ``old + (new - old) * c`` pass.
+  new_running_mean = running_mean + (mean - running_mean) * (1 - momentum)
+  new_running_var = running_var + (var - running_var) * (1 - momentum)
+  return new_running_mean, new_running_var, y
+
+
+@functools.partial(
+  jax.jit, static_argnames=('feature_axes', 'dtype', 'epsilon')
+)
+def _batch_norm_eval(
+  x,
+  running_mean,
+  running_var,
+  scale,
+  bias,
+  *,
+  feature_axes,
+  dtype,
+  epsilon,
+):
+  """Normalizes ``x`` with the running statistics of a BatchNorm.
+
+  With fixed statistics ``scale * rsqrt(var + epsilon)`` is folded into a
+  single factor ``a`` at the size of the features, and ``x`` is only read once
+  to compute ``(x - mean) * a + bias``. The mean is subtracted before scaling
+  rather than folded into the bias, since ``a * x - a * mean`` cancels
+  catastrophically when ``|mean|`` is large compared to the spread of ``x``.
+
+  Arguments:
+    x: The input.
+    running_mean: The running average of the mean.
+    running_var: The running average of the variance.
+    scale: Optional learned scale.
+    bias: Optional learned bias.
+    feature_axes: Canonical axes of ``x`` containing features.
+    dtype: The dtype of the result (default: infer from input and params).
+    epsilon: Normalization epsilon.
+
+  Returns:
+    The normalized input.
+  """
+  feature_shape = [1] * x.ndim
+  for ax in feature_axes:
+    feature_shape[ax] = x.shape[ax]
+  dtype = dtypes.canonicalize_dtype(
+    *(arg for arg in (x, scale, bias) if arg is not None), dtype=dtype
+  )
+  a = lax.rsqrt(running_var + epsilon)
+  if scale is not None:
+    a = a * scale.reshape(a.shape)
+  y = (x - _as_feature_param(running_mean, feature_shape)) * _as_feature_param(
+    a, feature_shape
+  )
+  if bias is not None:
+    y = y + _as_feature_param(bias, feature_shape)
+  if y.dtype != dtype:
+    y = y.astype(dtype)
+  return y
 
 
+def _hashable_groups(axis_index_groups: Any):
+  """Converts ``axis_index_groups`` into a hashable tuple of tuples."""
+  if axis_index_groups is None:
+    return None
+  return tuple(tuple(group) for group in axis_index_groups)
+
+
+@functools.partial(jax.jit, static_argnames=('axis', 'eps'))
 def _l2_normalize(x, axis=None, eps=1e-12):
   """Normalizes along dimension `axis` using an L2 norm.
 
@@ -236,7 +623,8 @@ def _l2_normalize(x, axis=None, eps=1e-12):
   Returns:
     An array of the same shape as 'x' L2-normalized along 'axis'.
   """
-  return x * jax.lax.rsqrt((x * x).sum(axis=axis, keepdims=True) + eps)
+  sum_sq = jnp.sum(lax.square(x), axis=axis, keepdims=True)
+  return x * lax.rsqrt(sum_sq + eps)
 
 
 class BatchNorm(Module):
@@ -369,6 +757,18 @@ class BatchNorm(Module):
         feature_shape,
     )
 
+    scale, bias = _normalization_params(
+      self,
+      x,
+      feature_axes,
+      self.param_dtype,
+      self.use_bias,
+      self.use_scale,
+      self.bias_init,
+      self.scale_init,
+      self.force_float32_reductions,
+    )
+
     if use_running_average:
       mean = (
           ra_mean.value
@@ -380,41 +780,41 @@ class BatchNorm(Module):
           if self.force_float32_reductions
           else jnp.asarray(ra_var.value, self.param_dtype)
       )
-    else:
-      mean, var = _compute_stats(
-          x,
-          reduction_axes,
-          dtype=self.dtype,
-          axis_name=self.axis_name if not self.is_initializing() else None,
-          axis_index_groups=self.axis_index_groups,
-          use_fast_variance=self.use_fast_variance,
-          mask=mask,
-          force_float32_reductions=self.force_float32_reductions,
+      return _batch_norm_eval(
+        x,
+        mean,
+        var,
+        scale,
+        bias,
+        feature_axes=feature_axes,
+        dtype=self.dtype,
+        epsilon=self.epsilon,
       )
 
-      if not self.is_initializing():
-        ra_mean.value = (
-          self.momentum * ra_mean.value + (1 - self.momentum) * mean
-        )
-        ra_var.value = self.momentum * ra_var.value + (1 - self.momentum) * var
-
-    return _normalize(
-      self,
+    new_mean, new_var, y = _batch_norm_train_step(
       x,
-      mean,
-      var,
-      reduction_axes,
-      feature_axes,
-      self.dtype,
-      self.param_dtype,
-      self.epsilon,
-      self.use_bias,
-      self.use_scale,
-      self.bias_init,
-      self.scale_init,
-      self.force_float32_reductions,
+      ra_mean.value,
+      ra_var.value,
+      scale,
+      bias,
+      mask,
+      momentum=self.momentum,
+      reduction_axes=reduction_axes,
+      feature_axes=feature_axes,
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name if not self.is_initializing() else None,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
+      force_float32_reductions=self.force_float32_reductions,
     )
 
+    if not self.is_initializing():
+      ra_mean.value = new_mean
+      ra_var.value = new_var
+
+    return y
+
 
 class LayerNorm(Module):
   """Layer normalization (https://arxiv.org/abs/1607.06450).
@@ -504,33 +904,31 @@ class LayerNorm(Module):
     Returns:
       Normalized inputs (the same shape as inputs).
     """
-    mean, var = _compute_stats(
-        x,
-        self.reduction_axes,
-        self.dtype,
-        self.axis_name,
-        self.axis_index_groups,
-        use_fast_variance=self.use_fast_variance,
-        mask=mask,
-        force_float32_reductions=self.force_float32_reductions,
-    )
-
-    return _normalize(
+    scale, bias = _normalization_params(
       self,
       x,
-      mean,
-      var,
-      self.reduction_axes,
       self.feature_axes,
-      self.dtype,
       self.param_dtype,
-      self.epsilon,
       self.use_bias,
       self.use_scale,
       self.bias_init,
       self.scale_init,
       self.force_float32_reductions,
     )
+    return _fused_norm_forward(
+      x,
+      scale,
+      bias,
+      mask,
+      reduction_axes=_canonicalize_axes(x.ndim, self.reduction_axes),
+      feature_axes=_canonicalize_axes(x.ndim, self.feature_axes),
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
+      force_float32_reductions=self.force_float32_reductions,
+    )
 
 
 class RMSNorm(Module):
@@ -604,34 +1002,32 @@ class RMSNorm(Module):
     Returns:
       Normalized inputs (the same shape as inputs).
     """
-    mean, var = _compute_stats(
-        x,
-        self.reduction_axes,
-        self.dtype,
-        self.axis_name,
-        self.axis_index_groups,
-        use_mean=False,
-        use_fast_variance=self.use_fast_variance,
-        mask=mask,
-        force_float32_reductions=self.force_float32_reductions,
-    )
-
-    return _normalize(
+    scale, bias = _normalization_params(
       self,
       x,
-      mean,
-      var,
-      self.reduction_axes,
       self.feature_axes,
-      self.dtype,
       self.param_dtype,
-      self.epsilon,
       False,
       self.use_scale,
       initializers.zeros,
       self.scale_init,
       self.force_float32_reductions,
     )
+    return _fused_norm_forward(
+      x,
+      scale,
+      bias,
+      mask,
+      reduction_axes=_canonicalize_axes(x.ndim, self.reduction_axes),
+      feature_axes=_canonicalize_axes(x.ndim, self.feature_axes),
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_mean=False,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
+      force_float32_reductions=self.force_float32_reductions,
+    )
 
 
 class GroupNorm(Module):
@@ -778,40 +1174,39 @@ class GroupNorm(Module):
       )
 
     group_size = x.shape[-1] // num_groups
-    group_shape = x.shape[:-1] + (num_groups, group_size)
-
-    if mask is not None:
-      mask = mask.reshape(mask.shape[:-1] + (num_groups, group_size))
-
-    mean, var = _compute_stats(
-        x.reshape(group_shape),
-        list(reduction_axes[:-1]) + [-1],
-        self.dtype,
-        self.axis_name,
-        self.axis_index_groups,
-        use_fast_variance=self.use_fast_variance,
-        mask=mask,
-        force_float32_reductions=self.force_float32_reductions,
-    )
-    mean = jnp.repeat(mean, group_size, axis=-1)
-    var = jnp.repeat(var, group_size, axis=-1)
 
-    return _normalize(
+    scale, bias = _normalization_params(
       self,
       x,
-      mean,
-      var,
-      reduction_axes[:-1],
       (feature_axis,),
-      self.dtype,
       self.param_dtype,
-      self.epsilon,
       self.use_bias,
       self.use_scale,
       self.bias_init,
       self.scale_init,
       self.force_float32_reductions,
     )
+    return _fused_norm_forward(
+      x,
+      scale,
+      bias,
+      mask,
+      reduction_axes=reduction_axes[:-1],
+      feature_axes=(x.ndim + feature_axis,),
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
+      group_size=group_size,
+      force_float32_reductions=self.force_float32_reductions,
+    )
+
+
+@functools.lru_cache
+def _instance_norm_reduction_axes(rank, feature_axes):
+  """Returns the axes InstanceNorm reduces: all but batch and feature axes."""
+  return tuple(i for i in range(1, rank) if i not in feature_axes)
 
 
 class InstanceNorm(Module):
@@ -908,35 +1303,162 @@ class InstanceNorm(Module):
     if 0 in feature_axes:
       raise ValueError('The channel axes cannot include the leading dimension '
                        'as this is assumed to be the batch axis.')
-    reduction_axes = [i for i in range(1, x.ndim) if i not in feature_axes]
+    reduction_axes = _instance_norm_reduction_axes(x.ndim, feature_axes)
 
-    mean, var = _compute_stats(
-        x,
-        reduction_axes,
-        self.dtype,
-        self.axis_name,
-        self.axis_index_groups,
-        use_fast_variance=self.use_fast_variance,
-        mask=mask,
-        force_float32_reductions=self.force_float32_reductions,
-    )
-
-    return _normalize(
+    scale, bias = _normalization_params(
       self,
       x,
-      mean,
-      var,
-      reduction_axes,
       feature_axes,
-      self.dtype,
       self.param_dtype,
-      self.epsilon,
       self.use_bias,
       self.use_scale,
       self.bias_init,
       self.scale_init,
       self.force_float32_reductions,
     )
+    return _fused_norm_forward(
+      x,
+      scale,
+      bias,
+      mask,
+      reduction_axes=reduction_axes,
+      feature_axes=feature_axes,
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
+      force_float32_reductions=self.force_float32_reductions,
+    )
+
+
+@functools.partial(jax.jit, static_argnames=('n_steps', 'eps'))
+def _power_iteration(value, u, *, n_steps, eps):
+  """Estimates the leading singular vectors of ``value``.
+
+  ``value`` is treated as the matrix of its leading axes against its last
+  axis. The ``n_steps`` steps run in a single ``lax.fori_loop``, so the
+  iteration is traced and compiled once, rather than unrolled into
+  ``2 * n_steps`` separate contractions and normalizations. With more than
+  one row in ``u``, this is subspace iteration: the rows are orthonormalized
+  instead of normalized at every step, which converges faster when the
+  leading singular values are close.
+
+  Args:
+    value: A tensor of rank at least two.
+    u: The current estimate of the right singular vectors, of shape ``(k,
+      value.shape[-1])``.
+    n_steps: The number of power iteration steps, at least one.
+    eps: A small float added to l2-normalization to avoid dividing by zero.
+
+  Returns:
+    A tuple ``(u, v, vw)`` of the updated right and left singular vector
+    estimates, where ``v`` has shape ``(k,) + value.shape[:-1]``, and of
+    ``v @ value``, in at least float32, before it was normalized into ``u``.
+  """
+  dtype = jnp.result_type(u, value)
+  # Accumulate the products in at least float32, so that a lower precision
+  # ``u`` and ``value`` can use the mixed precision matmul units, e.g. bf16
+  # with float32 accumulation, without losing the accuracy of ``sigma``.
+  acc_dtype = jnp.promote_types(dtype, jnp.float32)
+  contract = functools.partial(jnp.tensordot, preferred_element_type=acc_dtype)
+  # Contract over the leading axes of ``value`` directly, rather than
+  # flattening higher-order tensors, e.g. conv kernels, into a matrix first.
+  leading_axes = tuple(range(value.ndim - 1))
+  v_axes = tuple(range(1, value.ndim))
+
+  def normalize(x):
+    if x.shape[0] == 1:
+      return _l2_normalize(x, eps=eps)
+    q, _ = jnp.linalg.qr(x.reshape(x.shape[0], -1).T)
+    return q.T.reshape(x.shape)
+
+  def step(_, uv):
+    u, _, _ = uv
+    v = normalize(contract(u, value, axes=((1,), (value.ndim - 1,))))
+    v = jnp.asarray(v, dtype)
+    vw = contract(v, value, axes=(v_axes, leading_axes))
+    return jnp.asarray(normalize(vw), dtype), v, vw
+
+  u = jnp.asarray(u, dtype)
+  v = jnp.zeros(u.shape[:1] + value.shape[:-1], dtype)
+  vw = jnp.zeros(u.shape, acc_dtype)
+  return lax.fori_loop(0, n_steps, step, (u, v, vw))
+
+
+@jax.custom_jvp
+def _spectral_sigma(value, v, vw):
+  """Returns ``max_i |v_i @ value|``, given ``vw = v @ value``.
+
+  The value reuses ``vw`` from the last step of :func:`_power_iteration`, and
+  only the derivative with respect to ``value`` contracts ``v`` with it again.
+  ``v`` and ``vw`` are treated as constants, as if their gradients were
+  stopped.
+  """
+  del value, v
+  return jnp.max(jnp.linalg.norm(vw, axis=-1))
+
+
+@_spectral_sigma.defjvp
+def _spectral_sigma_jvp(primals, tangents):
+  value, v, vw = primals
+  value_dot = tangents[0]
+  vw_dot = jnp.tensordot(
+    v,
+    value_dot,
+    axes=(tuple(range(1, value.ndim)), tuple(range(value.ndim - 1))),
+  )
+  norms = jnp.linalg.norm(vw, axis=-1)
+  i = jnp.argmax(norms)
+  sigma = norms[i]
+  # the derivative of |vw_i| is vw_i / |vw_i|, taken as zero if vw_i is zero
+  u = vw[i] / jnp.where(sigma != 0, sigma, 1)
+  return sigma, jnp.vdot(u, vw_dot[i])
+
+
+@functools.partial(jax.jit, static_argnames=('n_steps',))
+def _frobenius_iteration(value, *, n_steps):
+  """Estimates the largest singular value of ``value`` by repeated cubing.
+
+  Each step ``G <- G G^T G`` cubes the singular values of ``G``, so the
+  Frobenius norm of ``G`` after ``t`` steps, taken to the power ``3^-t``,
+  converges quasi-quadratically to the largest singular value from above.
+  ``G`` is renormalized at every step and its scale is tracked as a logarithm
+  to keep the iterates in range. Higher-order tensors are flattened in their
+  leading dimensions.
+
+  Args:
+    value: A tensor of rank at least two.
+    n_steps: The number of iteration steps, at least one.
+
+  Returns:
+    The estimate of the largest singular value, or zero if ``value`` is zero.
+  """
+  g = value.reshape(-1, value.shape[-1])
+  g = jnp.asarray(g, jnp.promote_types(g.dtype, jnp.float32))
+  sq_norm = jnp.sum(lax.square(g))
+  nonzero = sq_norm != 0
+  # A zero ``value`` is iterated as a matrix of ones instead, so that neither
+  # the iteration nor its gradient divides by zero, and its estimate is then
+  # replaced by zero.
+  g = jnp.where(nonzero, g, 1)
+  norm = jnp.sqrt(jnp.where(nonzero, sq_norm, g.size))
+
+  def step(_, carry):
+    g, log_scale = carry
+    # Multiply through the smaller of the two Gram matrices, contracting
+    # ``g`` with itself directly rather than through a transposed copy.
+    if g.shape[0] >= g.shape[1]:
+      g = jnp.matmul(g, jnp.tensordot(g, g, axes=(0, 0)))
+    else:
+      g = jnp.matmul(jnp.tensordot(g, g, axes=(1, 1)), g)
+    norm = jnp.linalg.norm(g)
+    return g / norm, 3 * log_scale + jnp.log(norm)
+
+  _, log_scale = lax.fori_loop(
+    0, n_steps, step, (g / norm, jnp.log(norm))
+  )
+  return jnp.where(nonzero, jnp.exp(log_scale / 3**n_steps), 0)
 
 
 class SpectralNorm(Module):
@@ -1050,6 +1572,27 @@ class SpectralNorm(Module):
       than 2 is used by the layer.
     collection_name: Name of the collection to store intermediate values used
       when performing spectral normalization.
+    n_probe_vectors: The number of vectors ``u`` to run power iteration with.
+      With more than one, the vectors are kept orthonormal (subspace
+      iteration), which needs fewer ``n_steps`` when the largest singular
+      values of the weight are close.
+    power_iter_dtype: Optional dtype to run power iteration in and to store
+      ``u`` in, e.g. ``jnp.bfloat16`` to halve the memory traffic of its
+      matrix-vector products (default: ``param_dtype`` for ``u``, and the
+      promoted dtype of ``u`` and the weight for the iteration). ``sigma`` is
+      still computed and stored in at least float32.
+    sketch_size: If set, the singular value is estimated on ``sketch_size``
+      rows of the weight (flattened in its leading dimensions), sampled once
+      at initialization with probability proportional to their squared norm
+      and rescaled so that the sketch preserves the spectral norm in
+      expectation. This reduces the cost of every step for weights with many
+      more rows than columns, e.g. conv kernels.
+    method: How to estimate the largest singular value. ``'power_iter'``
+      (default) runs ``n_steps`` of power iteration, warm started from the
+      stored ``u`` vector. ``'frobenius_iter'`` takes the Frobenius norm of
+      the weight with its singular values raised to the power ``3^n_steps``,
+      which converges faster from above and needs no ``u`` vector, at the cost
+      of two matmuls of the weight's Gram size per step.
   """
 
   layer_instance: Module
@@ -1059,6 +1602,10 @@ class SpectralNorm(Module):
   param_dtype: Dtype = jnp.float32
   error_on_non_matrix: bool = False
   collection_name: str = 'batch_stats'
+  n_probe_vectors: int = 1
+  power_iter_dtype: Dtype | None = None
+  sketch_size: int | None = None
+  method: str = 'power_iter'
 
   @compact
   def __call__(self, *args, update_stats: bool, **kwargs):
@@ -1079,6 +1626,23 @@ class SpectralNorm(Module):
     Returns:
       Output of the layer using spectral normalized weights.
     """
+    if self.method not in ('power_iter', 'frobenius_iter'):
+      raise ValueError(
+        "method must be 'power_iter' or 'frobenius_iter', got "
+        f'{self.method!r}'
+      )
+    if self.n_probe_vectors < 1:
+      raise ValueError(
+        f'n_probe_vectors must be at least 1, got {self.n_probe_vectors}'
+      )
+    if self.sketch_size is not None and self.sketch_size < 1:
+      raise ValueError(
+        f'sketch_size must be at least 1, got {self.sketch_size}'
+      )
+    if self.n_steps < 1:
+      # No variable is normalized and no statistic is created, so skip mapping
+      # over the layer's variables altogether.
+      return self.layer_instance(*args, **kwargs)
 
     def layer_forward(layer_instance):
       return layer_instance(*args, **kwargs)
@@ -1110,8 +1674,7 @@ class SpectralNorm(Module):
         help the power iteration method approximate the true singular value
         more accurately over time.
     """
-    value = jnp.asarray(vs)
-    value_shape = value.shape
+    value = vs
 
     # Skip and return value if input is scalar, vector or if number of power
     # iterations is less than 1
@@ -1123,57 +1686,159 @@ class SpectralNorm(Module):
         raise ValueError(
           f'Input is {value.ndim}D but error_on_non_matrix is True'
         )
-      else:
-        value = jnp.reshape(value, (-1, value.shape[-1]))
 
-    u_var_name = (
-      self.layer_instance.name
-      + '/'
-      + '/'.join(dict_key.key for dict_key in path[1:])
-      + '/u'
-    )
-    u_var = self.variable(
-      self.collection_name,
-      u_var_name,
-      jax.random.normal,
-      self.make_rng('params')
-      if not self.has_variable(self.collection_name, u_var_name)
-      else None,
-      (1, value.shape[-1]),
-      self.param_dtype,
-    )
-    u0 = u_var.value
-    sigma_var_name = (
+    str_path = (
       self.layer_instance.name
       + '/'
       + '/'.join(dict_key.key for dict_key in path[1:])
-      + '/sigma'
     )
+    matrix = value
+    if self.sketch_size is not None:
+      matrix = self._sketch_rows(str_path, value)
+
+    if self.method == 'frobenius_iter':
+      sigma = _frobenius_iteration(matrix, n_steps=self.n_steps)
+      stats = (sigma,)
+    else:
+      max_rank = min(matrix.shape[-1], math.prod(matrix.shape[:-1]))
+      if self.n_probe_vectors > max_rank:
+        raise ValueError(
+          f'n_probe_vectors={self.n_probe_vectors} exceeds the rank of the '
+          f'{value.shape} weight at {str_path}'
+        )
+      u_var_name = str_path + '/u'
+      u_var = self.variable(
+        self.collection_name,
+        u_var_name,
+        jax.random.normal,
+        self.make_rng('params')
+        if not self.has_variable(self.collection_name, u_var_name)
+        else None,
+        (self.n_probe_vectors, value.shape[-1]),
+        self.power_iter_dtype or self.param_dtype,
+      )
+      u0 = u_var.value
+
+      # Power iteration for the weight's singular value.
+      iter_matrix = matrix
+      if self.power_iter_dtype is not None:
+        iter_matrix = jnp.asarray(matrix, self.power_iter_dtype)
+      u0, v0, vw = _power_iteration(
+        iter_matrix, u0, n_steps=self.n_steps, eps=self.epsilon
+      )
+
+      u0 = jax.lax.stop_gradient(u0)
+      v0 = jax.lax.stop_gradient(v0)
+
+      # ``v0 @ value @ u0.T`` is the norm of ``vw = v0 @ value``, which the
+      # last power iteration step already computed.
+      sigma = _spectral_sigma(matrix, v0, jax.lax.stop_gradient(vw))
+
+      if update_stats:
+        u_var.value = u0
+      stats = (u0, v0, sigma)
+
+    sigma_var_name = str_path + '/sigma'
     sigma_var = self.variable(
       self.collection_name, sigma_var_name, jnp.ones, (), self.param_dtype
     )
 
-    # Power iteration for the weight's singular value.
-    for _ in range(self.n_steps):
-      v0 = _l2_normalize(
-        jnp.matmul(u0, value.transpose([1, 0])), eps=self.epsilon
+    # ``sigma`` is a scalar, so guarding it and taking its reciprocal is cheap,
+    # and ``value`` is then only scaled by a single multiply.
+    value = value * lax.reciprocal(jnp.where(sigma != 0, sigma, 1))
+
+    if update_stats:
+      sigma_var.value = sigma
+
+    dtype = dtypes.canonicalize_dtype(vs, *stats, dtype=self.dtype)
+    return jnp.asarray(value, dtype)
+
+  def _sketch_rows(self, str_path, value):
+    """Returns a row sketch of ``value`` flattened in its leading dimensions.
+
+    The sampled rows and their scales are stored in ``self.collection_name``
+    next to ``u`` and ``sigma``, so the same sketch is used on every call.
+
+    Args:
+      str_path: the variable's key path, used for naming the sketch variables
+      value: the variable to sketch
+
+    Returns:
+      A ``(sketch_size, value.shape[-1])`` matrix, or ``value`` itself if it
+      does not have more than ``sketch_size`` rows.
+    """
+    matrix = value.reshape(-1, value.shape[-1])
+    num_rows = matrix.shape[0]
+    if self.sketch_size >= num_rows:
+      return value
+
+    rows_var_name = str_path + '/sketch_rows'
+    rows = row_scale = None
+    if not self.has_variable(self.collection_name, rows_var_name):
+      row_sq = jnp.sum(lax.square(matrix), axis=1)
+      total = jnp.sum(row_sq)
+      probs = jnp.where(total > 0, row_sq / total, 1 / num_rows)
+      rows = jax.random.choice(
+        self.make_rng('params'), num_rows, (self.sketch_size,), p=probs
       )
-      u0 = _l2_normalize(jnp.matmul(v0, value), eps=self.epsilon)
+      row_scale = lax.rsqrt(self.sketch_size * probs[rows])
+    rows_var = self.variable(
+      self.collection_name, rows_var_name, lambda: rows
+    )
+    row_scale_var = self.variable(
+      self.collection_name,
+      str_path + '/sketch_scale',
+      lambda: jnp.asarray(row_scale, self.param_dtype),
+    )
+    return matrix[rows_var.value] * row_scale_var.value[:, None]
 
-    u0 = jax.lax.stop_gradient(u0)
-    v0 = jax.lax.stop_gradient(v0)
 
-    sigma = jnp.matmul(jnp.matmul(v0, value), jnp.transpose(u0))[0, 0]
+@functools.lru_cache
+def _weight_norm_shapes(shape, feature_axes):
+  """Returns the axes and shapes WeightNorm needs for a variable.
 
-    value /= jnp.where(sigma != 0, sigma, 1)
-    value_bar = value.reshape(value_shape)
+  Memoized on the variable ``shape`` and canonical ``feature_axes``, which are
+  fixed across calls, so the axes are only worked out once per kernel shape.
 
-    if update_stats:
-      u_var.value = u0
-      sigma_var.value = sigma
+  Returns:
+    A tuple ``(reduction_axes, feature_shape, reduced_feature_shape)``, where
+    ``feature_shape`` is the shape of the scale broadcast against the
+    variable, and ``reduced_feature_shape`` the shape of the scale parameter.
+  """
+  reduction_axes = tuple(i for i in range(len(shape)) if i not in feature_axes)
+  feature_shape = [1] * len(shape)
+  reduced_feature_shape = []
+  for ax in feature_axes:
+    feature_shape[ax] = shape[ax]
+    reduced_feature_shape.append(shape[ax])
+  return reduction_axes, tuple(feature_shape), tuple(reduced_feature_shape)
+
+
+@functools.partial(jax.jit, static_argnames=('reduction_axes', 'eps', 'dtype'))
+def _weight_norm(value, scale, *, reduction_axes, eps, dtype):
+  """L2-normalizes ``value`` over ``reduction_axes`` and applies ``scale``.
+
+  The normalization, scale and cast are traced together, so they are compiled
+  once per shape and axes and shared by all the kernels of that shape, rather
+  than dispatched as separate ops for every wrapped variable. The scale is
+  folded into the inverse norm at the size of the features, so ``value`` is
+  only multiplied once.
 
-    dtype = dtypes.canonicalize_dtype(vs, u0, v0, sigma, dtype=self.dtype)
-    return jnp.asarray(value_bar, dtype)
+  Args:
+    value: The variable to normalize.
+    scale: Optional scale, broadcastable against ``value``.
+    reduction_axes: Canonical axes of ``value`` to compute the l2-norm over.
+    eps: Epsilon to avoid dividing by zero.
+    dtype: The dtype of the result.
+
+  Returns:
+    The normalized and scaled variable.
+  """
+  sum_sq = jnp.sum(lax.square(value), axis=reduction_axes, keepdims=True)
+  mul = lax.rsqrt(sum_sq + eps)
+  if scale is not None:
+    mul = mul * scale
+  return jnp.asarray(value * mul, dtype)
 
 
 class WeightNorm(Module):
@@ -1309,6 +1974,10 @@ class WeightNorm(Module):
     and normalize the weights using this value before computing the
     ``__call__`` output.
 
+    The weights are normalized on every call, including at inference. They
+    are derived from the ``params`` passed to ``apply``, so there is no cached
+    copy that could go stale when the params change.
+
     Args:
       *args: positional arguments to be passed into the call method of the
         underlying layer instance in ``self.layer_instance``.
@@ -1341,7 +2010,7 @@ class WeightNorm(Module):
       path: dict key path, used for naming the ``scale`` variable
       vs: variables to be l2-normalized
     """
-    value = jnp.asarray(vs)
+    value = vs
     str_path = (
       self.layer_instance.name
       + '/'
@@ -1356,22 +2025,14 @@ class WeightNorm(Module):
 
     if self.feature_axes is None:
       feature_axes = ()
-      reduction_axes = tuple(i for i in range(value.ndim))
     else:
       feature_axes = _canonicalize_axes(value.ndim, self.feature_axes)
-      reduction_axes = tuple(
-        i for i in range(value.ndim) if i not in feature_axes
-      )
-
-    feature_shape = [1] * value.ndim
-    reduced_feature_shape = []
-    for ax in feature_axes:
-      feature_shape[ax] = value.shape[ax]
-      reduced_feature_shape.append(value.shape[ax])
-
-    value_bar = _l2_normalize(value, axis=reduction_axes, eps=self.epsilon)
+    reduction_axes, feature_shape, reduced_feature_shape = _weight_norm_shapes(
+      value.shape, feature_axes
+    )
 
     args = [vs]
+    scale = None
     if self.use_scale:
       scale = self.param(
         str_path + '/scale',
@@ -1379,8 +2040,13 @@ class WeightNorm(Module):
         reduced_feature_shape,
         self.param_dtype,
       ).reshape(feature_shape)
-      value_bar *= scale
       args.append(scale)
 
     dtype = dtypes.canonicalize_dtype(*args, dtype=self.dtype)
-    return jnp.asarray(value_bar, dtype)
+    return _weight_norm(
+      value,
+      scale,
+      reduction_axes=reduction_axes,
+      eps=self.epsilon,
+      dtype=dtype,
+    )
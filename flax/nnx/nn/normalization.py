@@ -16,12 +16,18 @@ import typing as tp
 
 import jax
 import jax.numpy as jnp
-from jax import lax
 
 from flax import nnx
+from flax.linen.normalization import (
+  _batch_norm_eval,
+  _batch_norm_train_step,
+  _canonicalize_axes,
+  _fused_norm_forward,
+  _hashable_groups,
+)
 from flax.nnx import rnglib
 from flax.nnx.module import Module, first_from
-from flax.nnx.nn import dtypes, initializers
+from flax.nnx.nn import initializers
 from flax.typing import (
   Array,
   Dtype,
@@ -30,157 +36,6 @@ from flax.typing import (
 )
 
 
-def _canonicalize_axes(rank: int, axes: Axes) -> tp.Tuple[int, ...]:
-  """Returns a tuple of deduplicated, sorted, and positive axes."""
-  if not isinstance(axes, tp.Iterable):
-    axes = (axes,)
-  return tuple({rank + axis if axis < 0 else axis for axis in axes})
-
-
-def _abs_sq(x):
-  """Computes the elementwise square of the absolute value |x|^2."""
-  if jnp.iscomplexobj(x):
-    return lax.square(lax.real(x)) + lax.square(lax.imag(x))
-  else:
-    return lax.square(x)
-
-
-def _compute_stats(
-  x: Array,
-  axes: Axes,
-  dtype: tp.Optional[Dtype],
-  axis_name: tp.Optional[str] = None,
-  axis_index_groups: tp.Any = None,
-  use_mean: bool = True,
-  use_fast_variance: bool = True,
-  mask: tp.Optional[Array] = None,
-):
-  """Computes mean and variance statistics.
-
-  This implementation takes care of a few important details:
-  - Computes in float32 precision for stability in half precision training.
-  - If ``use_fast_variance`` is ``True``, mean and variance are computed using
-    Var = E[|x|^2] - |E[x]|^2, instead of Var = E[|x - E[x]|^2]), in a single
-    XLA fusion.
-  - Clips negative variances to zero which can happen due to
-    roundoff errors. This avoids downstream NaNs.
-  - Supports averaging across a parallel axis and subgroups of a parallel axis
-    with a single ``lax.pmean`` call to avoid latency.
-
-  Arguments:
-    x: Input array.
-    axes: The axes in ``x`` to compute mean and variance statistics for.
-    dtype: Optional dtype specifying the minimal precision. Statistics are
-      always at least float32 for stability (default: dtype of x).
-    axis_name: Optional name for the pmapped axis to compute mean over. Note,
-      this is only used for pmap and shard map. For SPMD jit, you do not need to
-      manually synchronize. Just make sure that the axes are correctly annotated
-      and XLA:SPMD will insert the necessary collectives.
-    axis_index_groups: Optional axis indices.
-    use_mean: If true, calculate the mean from the input and use it when
-      computing the variance. If false, set the mean to zero and compute the
-      variance without subtracting the mean.
-    use_fast_variance: If true, use a faster, but less numerically stable,
-      calculation for the variance.
-    mask: Binary array of shape broadcastable to ``inputs`` tensor, indicating
-      the positions for which the mean and variance should be computed.
-
-  Returns:
-    A pair ``(mean, var)``.
-  """
-  if dtype is None:
-    dtype = jnp.result_type(x)
-  # promote x to at least float32, this avoids half precision computation
-  # but preserves double or complex floating points
-  dtype = jnp.promote_types(dtype, jnp.float32)
-  x = jnp.asarray(x, dtype)
-  axes = _canonicalize_axes(x.ndim, axes)
-
-  def maybe_distributed_mean(*xs, mask=None):
-    mus = tuple(x.mean(axes, where=mask) for x in xs)
-    if axis_name is None:
-      return mus if len(xs) > 1 else mus[0]
-    else:
-      # In the distributed case we stack multiple arrays to speed comms.
-      if len(xs) > 1:
-        reduced_mus = lax.pmean(
-          jnp.stack(mus, axis=0),
-          axis_name,
-          axis_index_groups=axis_index_groups,
-        )
-        return tuple(reduced_mus[i] for i in range(len(xs)))
-      else:
-        return lax.pmean(mus[0], axis_name, axis_index_groups=axis_index_groups)
-
-  if use_mean:
-    if use_fast_variance:
-      mu, mu2 = maybe_distributed_mean(x, _abs_sq(x), mask=mask)
-      # mean2 - _abs_sq(mean) is not guaranteed to be non-negative due
-      # to floating point round-off errors.
-      var = jnp.maximum(0.0, mu2 - _abs_sq(mu))
-    else:
-      mu = maybe_distributed_mean(x, mask=mask)
-      var = maybe_distributed_mean(
-        _abs_sq(x - jnp.expand_dims(mu, axes)), mask=mask
-      )
-  else:
-    var = maybe_distributed_mean(_abs_sq(x), mask=mask)
-    mu = jnp.zeros_like(var)
-  return mu, var
-
-
-def _normalize(
-  x: Array,
-  mean: Array,
-  var: Array,
-  scale: tp.Optional[Array],
-  bias: tp.Optional[Array],
-  reduction_axes: Axes,
-  feature_axes: Axes,
-  dtype: tp.Optional[Dtype],
-  epsilon: float,
-):
-  """ "Normalizes the input of a normalization layer and optionally applies a learned scale and bias.
-
-  Arguments:
-    x: The input.
-    mean: Mean to use for normalization.
-    var: Variance to use for normalization.
-    reduction_axes: The axes in ``x`` to reduce.
-    feature_axes: Axes containing features. A separate bias and scale is learned
-      for each specified feature.
-    dtype: The dtype of the result (default: infer from input and params).
-    epsilon: Normalization epsilon.
-
-  Returns:
-    The normalized input.
-  """
-  reduction_axes = _canonicalize_axes(x.ndim, reduction_axes)
-  feature_axes = _canonicalize_axes(x.ndim, feature_axes)
-  stats_shape = list(x.shape)
-  for axis in reduction_axes:
-    stats_shape[axis] = 1
-  mean = mean.reshape(stats_shape)
-  var = var.reshape(stats_shape)
-  feature_shape = [1] * x.ndim
-  for ax in feature_axes:
-    feature_shape[ax] = x.shape[ax]
-  y = x - mean
-  mul = lax.rsqrt(var + epsilon)
-  args = [x]
-  if scale is not None:
-    scale = scale.reshape(feature_shape)
-    mul *= scale
-    args.append(scale)
-  y *= mul
-  if bias is not None:
-    bias = bias.reshape(feature_shape)
-    y += bias
-    args.append(bias)
-  dtype = dtypes.canonicalize_dtype(*args, dtype=dtype)
-  return jnp.asarray(y, dtype)
-
-
 class BatchNorm(Module):
   """BatchNorm Module.
 
@@ -346,37 +201,38 @@ class BatchNorm(Module):
     feature_axes = _canonicalize_axes(x.ndim, self.axis)
     reduction_axes = tuple(i for i in range(x.ndim) if i not in feature_axes)
 
+    scale = self.scale.value if self.scale else None
+    bias = self.bias.value if self.bias else None
+
     if use_running_average:
-      mean, var = self.mean.value, self.var.value
-    else:
-      mean, var = _compute_stats(
+      return _batch_norm_eval(
         x,
-        reduction_axes,
+        self.mean.value,
+        self.var.value,
+        scale,
+        bias,
+        feature_axes=feature_axes,
         dtype=self.dtype,
-        axis_name=self.axis_name,
-        axis_index_groups=self.axis_index_groups,
-        use_fast_variance=self.use_fast_variance,
-        mask=mask,
+        epsilon=self.epsilon,
       )
 
-      self.mean.value = (
-        self.momentum * self.mean.value + (1 - self.momentum) * mean
-      )
-      self.var.value = (
-        self.momentum * self.var.value + (1 - self.momentum) * var
-      )
-
-    return _normalize(
+    self.mean.value, self.var.value, y = _batch_norm_train_step(
       x,
-      mean,
-      var,
-      self.scale.value if self.scale else None,
-      self.bias.value if self.bias else None,
-      reduction_axes,
-      feature_axes,
-      self.dtype,
-      self.epsilon,
+      self.mean.value,
+      self.var.value,
+      scale,
+      bias,
+      mask,
+      momentum=self.momentum,
+      reduction_axes=reduction_axes,
+      feature_axes=feature_axes,
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
     )
+    return y
 
 
 class LayerNorm(Module):
@@ -493,26 +349,18 @@ class LayerNorm(Module):
     Returns:
       Normalized inputs (the same shape as inputs).
     """
-    mean, var = _compute_stats(
+    return _fused_norm_forward(
       x,
-      self.reduction_axes,
-      self.dtype,
-      self.axis_name,
-      self.axis_index_groups,
-      use_fast_variance=self.use_fast_variance,
-      mask=mask,
-    )
-
-    return _normalize(
-      x,
-      mean,
-      var,
       self.scale.value if self.scale else None,
       self.bias.value if self.bias else None,
-      self.reduction_axes,
-      self.feature_axes,
-      self.dtype,
-      self.epsilon,
+      mask,
+      reduction_axes=_canonicalize_axes(x.ndim, self.reduction_axes),
+      feature_axes=_canonicalize_axes(x.ndim, self.feature_axes),
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
     )
 
 
@@ -614,27 +462,19 @@ class RMSNorm(Module):
     Returns:
       Normalized inputs (the same shape as inputs).
     """
-    mean, var = _compute_stats(
-      x,
-      self.reduction_axes,
-      self.dtype,
-      self.axis_name,
-      self.axis_index_groups,
-      use_mean=False,
-      use_fast_variance=self.use_fast_variance,
-      mask=mask,
-    )
-
-    return _normalize(
+    return _fused_norm_forward(
       x,
-      mean,
-      var,
       self.scale.value if self.scale else None,
       None,
-      self.reduction_axes,
-      self.feature_axes,
-      self.dtype,
-      self.epsilon,
+      mask,
+      reduction_axes=_canonicalize_axes(x.ndim, self.reduction_axes),
+      feature_axes=_canonicalize_axes(x.ndim, self.feature_axes),
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_mean=False,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
     )
 
 class GroupNorm(Module):
@@ -810,29 +650,17 @@ class GroupNorm(Module):
       reduction_axes = list(range(1, x.ndim - 1)) + [-1]
     reduction_axes = _canonicalize_axes(x.ndim, reduction_axes)
 
-    group_shape = x.shape[:-1] + (self.num_groups, self.group_size)
-    if mask is not None:
-      mask = mask.reshape(mask.shape[:-1] + (self.num_groups, self.group_size))
-
-    mean, var = _compute_stats(
-      x.reshape(group_shape),
-      list(reduction_axes[:-1]) + [-1],
-      self.dtype,
-      self.axis_name,
-      self.axis_index_groups,
-      use_fast_variance=self.use_fast_variance,
-      mask=mask,
-    )
-    mean = jnp.repeat(mean, self.group_size, axis=1)
-    var = jnp.repeat(var, self.group_size, axis=1)
-    return _normalize(
+    return _fused_norm_forward(
       x,
-      mean,
-      var,
       self.scale.value if self.scale else None,
       self.bias.value if self.bias else None,
-      reduction_axes[:-1],
-      (self.feature_axis,),
-      self.dtype,
-      self.epsilon,
+      mask,
+      reduction_axes=reduction_axes[:-1],
+      feature_axes=(x.ndim + self.feature_axis,),
+      dtype=self.dtype,
+      epsilon=self.epsilon,
+      use_fast_variance=self.use_fast_variance,
+      axis_name=self.axis_name,
+      axis_index_groups=_hashable_groups(self.axis_index_groups),
+      group_size=self.group_size,
     )
\ No newline at end of file
@@ -223,6 +223,29 @@ class NormalizationTest(parameterized.TestCase):
       rtol=1e-4,
     )
 
+  def test_batch_norm_running_average_large_mean(self):
+    # The running mean is much larger than the spread of the inputs, so
+    # folding it into the bias as ``x * a - mean * a`` would cancel
+    # catastrophically.
+    mean, var = 1234.567, 0.01
+    x = mean + 0.1 * random.normal(random.key(0), (16, 3))
+    model_cls = nn.BatchNorm(use_running_average=True)
+    variables = model_cls.init(random.key(1), x)
+    variables = {
+      'params': variables['params'],
+      'batch_stats': {
+        'mean': jnp.full((3,), mean),
+        'var': jnp.full((3,), var),
+      },
+    }
+    y = model_cls.apply(variables, x)
+
+    x64 = np.asarray(x, np.float64)
+    mean64 = np.float64(np.float32(mean))
+    var64 = np.float64(np.float32(var))
+    expected = (x64 - mean64) / np.sqrt(var64 + model_cls.epsilon)
+    np.testing.assert_allclose(y, expected, rtol=0, atol=1e-5)
+
   @parameterized.parameters({'test_mask': True}, {'test_mask': False})
   def test_batch_norm_complex(self, test_mask):
     rng = random.key(0)
@@ -661,14 +684,42 @@ class NormalizationTest(parameterized.TestCase):
     {'n_steps': 3, 'update_stats': True, 'result': 4.0},
     {'n_steps': 10, 'update_stats': True, 'result': 4.0},
     {'n_steps': 1, 'update_stats': False, 'result': 1.0},
+    {
+      'n_steps': 10,
+      'update_stats': True,
+      'result': 4.0,
+      'method': 'frobenius_iter',
+    },
+    {
+      'n_steps': 1,
+      'update_stats': False,
+      'result': 1.0,
+      'method': 'frobenius_iter',
+    },
+    {
+      'n_steps': 3,
+      'update_stats': True,
+      'result': 4.0,
+      'n_probe_vectors': 2,
+    },
   )
-  def test_spectral_norm_sigma(self, n_steps, update_stats, result):
+  def test_spectral_norm_sigma(
+    self,
+    n_steps,
+    update_stats,
+    result,
+    method='power_iter',
+    n_probe_vectors=1,
+  ):
     class Foo(nn.Module):
       @nn.compact
       def __call__(self, x, train):
-        x = nn.SpectralNorm(nn.Dense(8, use_bias=False), n_steps=n_steps)(
-          x, update_stats=train
-        )
+        x = nn.SpectralNorm(
+          nn.Dense(8, use_bias=False),
+          n_steps=n_steps,
+          method=method,
+          n_probe_vectors=n_probe_vectors,
+        )(x, update_stats=train)
         return x
 
     x = jnp.ones((1, 8))
@@ -688,6 +739,28 @@ class NormalizationTest(parameterized.TestCase):
       atol=1e-3,
     )
 
+  @parameterized.parameters('power_iter', 'frobenius_iter')
+  def test_spectral_norm_zero_kernel_grad(self, method):
+    layer = nn.SpectralNorm(
+      nn.Dense(4, use_bias=False, kernel_init=nn.initializers.zeros),
+      method=method,
+    )
+    x = jnp.ones((2, 3))
+    variables = layer.init(random.PRNGKey(0), x, update_stats=False)
+
+    def loss_fn(params):
+      y, _ = layer.apply(
+        {'params': params, 'batch_stats': variables['batch_stats']},
+        x,
+        update_stats=True,
+        mutable=['batch_stats'],
+      )
+      return jnp.sum(y)
+
+    grads = jax.grad(loss_fn)(variables['params'])
+    for grad in jax.tree_util.tree_leaves(grads):
+      self.assertTrue(jnp.all(jnp.isfinite(grad)))
+
   @parameterized.parameters(
     {'error_on_non_matrix': True}, {'error_on_non_matrix': False}
   )
@@ -712,6 +785,70 @@ class NormalizationTest(parameterized.TestCase):
     else:
       _ = model_cls.init(random.PRNGKey(0), x, train=False)
 
+  def test_spectral_norm_power_iter_dtype(self):
+    class Foo(nn.Module):
+      @nn.compact
+      def __call__(self, x, train):
+        x = nn.SpectralNorm(
+          nn.Dense(8, use_bias=False),
+          n_steps=3,
+          power_iter_dtype=jnp.bfloat16,
+        )(x, update_stats=train)
+        return x
+
+    x = jnp.ones((1, 8))
+    model_cls = Foo()
+    variables = model_cls.init(random.PRNGKey(0), x, train=False)
+    params = jax.tree_util.tree_map(
+      lambda x: 4 * jnp.eye(*x.shape), variables['params']
+    )
+    _, updates = model_cls.apply(
+      {'params': params, 'batch_stats': variables['batch_stats']},
+      x=x,
+      train=True,
+      mutable=True,
+    )
+    batch_stats = updates['batch_stats']['SpectralNorm_0']
+    self.assertEqual(batch_stats['Dense_0/kernel/u'].dtype, jnp.bfloat16)
+    self.assertEqual(batch_stats['Dense_0/kernel/sigma'].dtype, jnp.float32)
+    np.testing.assert_allclose(
+      batch_stats['Dense_0/kernel/sigma'], 4.0, rtol=1e-2
+    )
+
+  def test_spectral_norm_sketch(self):
+    class Foo(nn.Module):
+      @nn.compact
+      def __call__(self, x, train):
+        x = nn.SpectralNorm(
+          nn.Dense(4, use_bias=False, kernel_init=nn.initializers.ones),
+          n_steps=3,
+          sketch_size=16,
+        )(x, update_stats=train)
+        return x
+
+    x = jnp.ones((1, 64))
+    model_cls = Foo()
+    variables = model_cls.init(random.PRNGKey(0), x, train=False)
+    batch_stats = variables['batch_stats']['SpectralNorm_0']
+    self.assertEqual(batch_stats['Dense_0/kernel/sketch_rows'].shape, (16,))
+    self.assertEqual(batch_stats['Dense_0/kernel/sketch_scale'].shape, (16,))
+
+    # The ones kernel at init samples rows uniformly, and the sketch of a
+    # kernel with equal rows is then exact.
+    kernel = jnp.tile(jnp.arange(1.0, 5.0), (64, 1))
+    params = jax.tree_util.tree_map(lambda _: kernel, variables['params'])
+    _, updates = model_cls.apply(
+      {'params': params, 'batch_stats': variables['batch_stats']},
+      x=x,
+      train=True,
+      mutable=True,
+    )
+    np.testing.assert_allclose(
+      updates['batch_stats']['SpectralNorm_0']['Dense_0/kernel/sigma'],
+      np.linalg.norm(kernel, ord=2),
+      rtol=1e-4,
+    )
+
   @parameterized.parameters(
     {'feature_axes': -1, 'reduction_axes': 0, 'variable_filter': {'kernel'}},
     {'feature_axes': 0, 'reduction_axes': 1, 'variable_filter': {'kernel'}},
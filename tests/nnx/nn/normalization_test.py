@@ -25,107 +25,51 @@ from flax import nnx
 from flax.typing import Dtype
 
 
-class TestLinenConsistency(parameterized.TestCase):
-  @parameterized.product(
-    dtype=[jnp.float32, jnp.float16],
-    param_dtype=[jnp.float32, jnp.float16],
-    use_fast_variance=[True, False],
-    mask=[None, np.array([True, False, True, False, True])],
-  )
-  def test_nnx_linen_batchnorm_equivalence(
-    self,
-    dtype: tp.Optional[Dtype],
-    param_dtype: Dtype,
-    use_fast_variance: bool,
-    mask: tp.Optional[np.ndarray],
-  ):
-    class NNXModel(nnx.Module):
-      def __init__(self, dtype, param_dtype, use_fast_variance, rngs):
-        self.norm_layer = nnx.BatchNorm(
-          5,
-          use_running_average=False,
-          dtype=dtype,
-          param_dtype=param_dtype,
-          use_fast_variance=use_fast_variance,
-          rngs=rngs,
-        )
-        self.linear = nnx.Linear(
-          5, 4, dtype=dtype, param_dtype=param_dtype, rngs=rngs
-        )
-
-      def __call__(self, x, *, mask=None):
-        x = self.norm_layer(x, mask=mask)
-        x = self.linear(x)
-        return x
-
-    class LinenModel(linen.Module):
-      dtype: tp.Optional[Dtype] = None
-      param_dtype: Dtype = jnp.float32
-      use_fast_variance: bool = True
-
-      def setup(self):
-        self.norm_layer = linen.BatchNorm(
-          use_running_average=False,
-          dtype=self.dtype,
-          param_dtype=self.param_dtype,
-          use_fast_variance=use_fast_variance,
-        )
-        self.linear = linen.Dense(
-          4, dtype=self.dtype, param_dtype=self.param_dtype
-        )
-
-      def __call__(self, x, *, mask=None):
-        x = self.norm_layer(x, mask=mask)
-        x = self.linear(x)
-        return x
-
-    rngs = nnx.Rngs(42)
-    x = jax.random.normal(jax.random.key(0), (10, 5))
-
-    linen_model = LinenModel(
-      dtype=dtype, param_dtype=param_dtype, use_fast_variance=use_fast_variance
-    )
-    variables = linen_model.init(jax.random.key(1), x)
-    linen_out, batch_stats = linen_model.apply(
-      variables, x, mask=mask, mutable=['batch_stats']
-    )
-
-    nnx_model = NNXModel(
-      dtype=dtype,
-      param_dtype=param_dtype,
-      use_fast_variance=use_fast_variance,
-      rngs=rngs,
-    )
-    nnx_model.linear.kernel.value = variables['params']['linear']['kernel']
-    nnx_model.linear.bias.value = variables['params']['linear']['bias']
+# The norm layers compared by ``TestLinenConsistency``, as
+# ``(nnx_cls, linen_cls, features, norm_kwargs)``.
+_NORM_CASES = {
+  'batch_norm': (
+    nnx.BatchNorm,
+    linen.BatchNorm,
+    5,
+    {'use_running_average': False},
+  ),
+  'layer_norm': (nnx.LayerNorm, linen.LayerNorm, 5, {}),
+  'rms_norm': (nnx.RMSNorm, linen.RMSNorm, 5, {}),
+  'group_norm': (nnx.GroupNorm, linen.GroupNorm, 6, {'num_groups': 3}),
+}
 
-    nnx_out = nnx_model(x, mask=mask)
-    np.testing.assert_array_equal(linen_out, nnx_out)
 
+class TestLinenConsistency(parameterized.TestCase):
   @parameterized.product(
-    dtype=[jnp.float32, jnp.float16],
+    norm=list(_NORM_CASES),
+    dtype=[jnp.float32, jnp.bfloat16, jnp.float16],
     param_dtype=[jnp.float32, jnp.float16],
     use_fast_variance=[True, False],
-    mask=[None, np.array([True, False, True, False, True])],
+    use_mask=[False, True],
   )
-  def test_nnx_linen_layernorm_equivalence(
+  def test_nnx_linen_equivalence(
     self,
+    norm: str,
     dtype: tp.Optional[Dtype],
     param_dtype: Dtype,
     use_fast_variance: bool,
-    mask: tp.Optional[np.ndarray],
+    use_mask: bool,
   ):
+    nnx_cls, linen_cls, features, norm_kwargs = _NORM_CASES[norm]
+
     class NNXModel(nnx.Module):
       def __init__(self, dtype, param_dtype, use_fast_variance, rngs):
-        self.norm_layer = nnx.LayerNorm(
-          5,
+        self.norm_layer = nnx_cls(
+          features,
+          **norm_kwargs,
           dtype=dtype,
           param_dtype=param_dtype,
           use_fast_variance=use_fast_variance,
           rngs=rngs,
         )
         self.linear = nnx.Linear(
-          5, 4, dtype=dtype, param_dtype=param_dtype, rngs=rngs
+          features, 4, dtype=dtype, param_dtype=param_dtype, rngs=rngs
         )
 
       def __call__(self, x, *, mask=None):
@@ -139,7 +83,8 @@ class TestLinenConsistency(parameterized.TestCase):
       use_fast_variance: bool = True
 
       def setup(self):
-        self.norm_layer = linen.LayerNorm(
+        self.norm_layer = linen_cls(
+          **norm_kwargs,
           dtype=self.dtype,
           param_dtype=self.param_dtype,
           use_fast_variance=self.use_fast_variance,
@@ -154,14 +99,18 @@ class TestLinenConsistency(parameterized.TestCase):
         return x
 
     rngs = nnx.Rngs(42)
-    x = jax.random.normal(jax.random.key(0), (10, 5))
+    x = jax.random.normal(jax.random.key(0), (10, features))
+    mask = jnp.arange(features) % 2 == 0 if use_mask else None
 
     linen_model = LinenModel(
       dtype=dtype, param_dtype=param_dtype, use_fast_variance=use_fast_variance
     )
     variables = linen_model.init(jax.random.key(1), x)
-    linen_out = linen_model.apply(variables, x, mask=mask)
-    assert isinstance(linen_out, jax.Array)
+    # Only BatchNorm updates ``batch_stats``, for the other norms the updates
+    # are empty.
+    linen_out, linen_updates = linen_model.apply(
+      variables, x, mask=mask, mutable=['batch_stats']
+    )
 
     nnx_model = NNXModel(
       dtype=dtype,
@@ -169,159 +118,62 @@ class TestLinenConsistency(parameterized.TestCase):
       use_fast_variance=use_fast_variance,
       rngs=rngs,
     )
-    nnx_model.linear.kernel.value = variables['params']['linear']['kernel']
-    nnx_model.linear.bias.value = variables['params']['linear']['bias']
+    nnx.update(nnx_model.linear, variables['params']['linear'])
 
     nnx_out = nnx_model(x, mask=mask)
+    linen_out, nnx_out = jax.device_get((linen_out, nnx_out))
     np.testing.assert_array_equal(linen_out, nnx_out)
-
-  @parameterized.product(
-    dtype=[jnp.float32, jnp.float16],
-    param_dtype=[jnp.float32, jnp.float16],
-    use_fast_variance=[True, False],
-    mask=[None, np.array([True, False, True, False, True])],
-  )
-  def test_nnx_linen_rmsnorm_equivalence(
-    self,
-    dtype: tp.Optional[Dtype],
-    param_dtype: Dtype,
-    use_fast_variance: bool,
-    mask: tp.Optional[np.ndarray],
-  ):
-    class NNXModel(nnx.Module):
-      def __init__(self, dtype, param_dtype, use_fast_variance, rngs):
-        self.norm_layer = nnx.RMSNorm(
-          5,
-          dtype=dtype,
-          param_dtype=param_dtype,
-          use_fast_variance=use_fast_variance,
-          rngs=rngs,
-        )
-        self.linear = nnx.Linear(
-          5, 4, dtype=dtype, param_dtype=param_dtype, rngs=rngs
-        )
-
-      def __call__(self, x, *, mask=None):
-        x = self.norm_layer(x, mask=mask)
-        x = self.linear(x)
-        return x
-
-    class LinenModel(linen.Module):
-      dtype: tp.Optional[Dtype] = None
-      param_dtype: Dtype = jnp.float32
-      use_fast_variance: bool = True
-
-      def setup(self):
-        self.norm_layer = linen.RMSNorm(
-          dtype=self.dtype,
-          param_dtype=self.param_dtype,
-          use_fast_variance=self.use_fast_variance,
-        )
-        self.linear = linen.Dense(
-          4, dtype=self.dtype, param_dtype=self.param_dtype
-        )
-
-      def __call__(self, x, *, mask=None):
-        x = self.norm_layer(x, mask=mask)
-        x = self.linear(x)
-        return x
-
-    rngs = nnx.Rngs(42)
-    x = jax.random.normal(jax.random.key(0), (10, 5))
-
-    linen_model = LinenModel(
-      dtype=dtype, param_dtype=param_dtype, use_fast_variance=use_fast_variance
+    if norm == 'batch_norm':
+      linen_stats = linen_updates['batch_stats']['norm_layer']
+      np.testing.assert_array_equal(
+        linen_stats['mean'], nnx_model.norm_layer.mean.value
+      )
+      np.testing.assert_array_equal(
+        linen_stats['var'], nnx_model.norm_layer.var.value
+      )
+
+
+class TestNormalization(parameterized.TestCase):
+  @parameterized.parameters(*_NORM_CASES)
+  def test_float16_stats_accumulate_in_float32(self, norm: str):
+    nnx_cls, _, features, norm_kwargs = _NORM_CASES[norm]
+    # |x|^2 of these inputs overflows float16, so the outputs are only finite
+    # and accurate if the statistics are accumulated in float32.
+    x = 1000 * jax.random.normal(jax.random.key(0), (10, features))
+    norm_fp16 = nnx_cls(
+      features, **norm_kwargs, dtype=jnp.float16, rngs=nnx.Rngs(0)
     )
-    variables = linen_model.init(jax.random.key(1), x)
-    linen_out = linen_model.apply(variables, x, mask=mask)
-
-    nnx_model = NNXModel(
-      dtype=dtype,
-      param_dtype=param_dtype,
-      use_fast_variance=use_fast_variance,
-      rngs=rngs,
+    norm_fp32 = nnx_cls(
+      features, **norm_kwargs, dtype=jnp.float32, rngs=nnx.Rngs(0)
     )
-    nnx_model.linear.kernel.value = variables['params']['linear']['kernel']
-    nnx_model.linear.bias.value = variables['params']['linear']['bias']
 
-    nnx_out = nnx_model(x, mask=mask)
-    assert isinstance(linen_out, jax.Array)
-    np.testing.assert_array_equal(linen_out, nnx_out)
+    y = norm_fp16(x.astype(jnp.float16))
+    self.assertEqual(y.dtype, jnp.float16)
+    self.assertTrue(jnp.all(jnp.isfinite(y)))
+    np.testing.assert_allclose(y, norm_fp32(x), rtol=1e-2, atol=1e-2)
 
   @parameterized.product(
-    dtype=[jnp.float32, jnp.float16],
-    param_dtype=[jnp.float32, jnp.float16],
-    use_fast_variance=[True, False],
-    mask=[None, np.array([True, False, True, False, True, False])],
+    norm=['batch_norm', 'layer_norm', 'group_norm'],
+    dtype_atol=[(jnp.bfloat16, 2e-2), (jnp.float16, 2e-3)],
   )
-  def test_nnx_linen_groupnorm_equivalence(
-    self,
-    dtype: tp.Optional[Dtype],
-    param_dtype: Dtype,
-    use_fast_variance: bool,
-    mask: tp.Optional[np.ndarray],
-  ):
-    class NNXModel(nnx.Module):
-      def __init__(self, dtype, param_dtype, use_fast_variance, rngs):
-        self.norm_layer = nnx.GroupNorm(
-          6,
-          num_groups=3,
-          dtype=dtype,
-          param_dtype=param_dtype,
-          use_fast_variance=use_fast_variance,
-          rngs=rngs,
-        )
-        self.linear = nnx.Linear(
-          6, 4, dtype=dtype, param_dtype=param_dtype, rngs=rngs
-        )
-
-      def __call__(self, x, *, mask=None):
-        x = self.norm_layer(x, mask=mask)
-        x = self.linear(x)
-        return x
-
-    class LinenModel(linen.Module):
-      dtype: tp.Optional[Dtype] = None
-      param_dtype: Dtype = jnp.float32
-      use_fast_variance: bool = True
-
-      def setup(self):
-        self.norm_layer = linen.GroupNorm(
-          num_groups=3,
-          dtype=self.dtype,
-          param_dtype=self.param_dtype,
-          use_fast_variance=self.use_fast_variance,
-        )
-        self.linear = linen.Dense(
-          4, dtype=self.dtype, param_dtype=self.param_dtype
-        )
-
-      def __call__(self, x, *, mask=None):
-        x = self.norm_layer(x, mask=mask)
-        x = self.linear(x)
-        return x
-
-    rngs = nnx.Rngs(42)
-    x = jax.random.normal(jax.random.key(0), (10, 6))
-
-    linen_model = LinenModel(
-      dtype=dtype, param_dtype=param_dtype, use_fast_variance=use_fast_variance
+  def test_half_precision_offset_inputs(self, norm: str, dtype_atol):
+    dtype, atol = dtype_atol
+    nnx_cls, _, features, norm_kwargs = _NORM_CASES[norm]
+    # The mean of these inputs is much larger than their spread, so rounding
+    # it to half precision before subtracting it from x would dominate the
+    # error; only the final rounding of the output should remain.
+    x = 100 + jax.random.normal(jax.random.key(0), (10, features))
+    x = x.astype(dtype)
+    norm_half = nnx_cls(features, **norm_kwargs, dtype=dtype, rngs=nnx.Rngs(0))
+    norm_fp32 = nnx_cls(
+      features, **norm_kwargs, dtype=jnp.float32, rngs=nnx.Rngs(0)
     )
-    variables = linen_model.init(jax.random.key(1), x)
-    linen_out = linen_model.apply(variables, x, mask=mask)
 
-    nnx_model = NNXModel(
-      dtype=dtype,
-      param_dtype=param_dtype,
-      use_fast_variance=use_fast_variance,
-      rngs=rngs,
+    y = norm_half(x)
+    self.assertEqual(y.dtype, dtype)
+    np.testing.assert_allclose(
+      y.astype(jnp.float32), norm_fp32(x.astype(jnp.float32)), rtol=0, atol=atol
     )
-    nnx_model.linear.kernel.value = variables['params']['linear']['kernel']
-    nnx_model.linear.bias.value = variables['params']['linear']['bias']
-
-    nnx_out = nnx_model(x, mask=mask)
-    assert isinstance(linen_out, jax.Array)
-    np.testing.assert_array_equal(linen_out, nnx_out)
 
 
 if __name__ == '__main__':